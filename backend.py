@@ -0,0 +1,168 @@
+import math
+import os
+from contextlib import contextmanager
+
+from long_math import (mag_add, mag_divmod, mag_from_int, mag_gcdext, mag_mul,
+                       mag_pow, mag_root, mag_sqr, mag_sub, mag_to_int)
+
+try:
+    import gmpy2
+except ImportError:
+    gmpy2 = None
+
+
+class LimbBackend:
+
+    name = 'limb'
+    powmod = None
+
+    add = staticmethod(mag_add)
+    sub = staticmethod(mag_sub)
+    mul = staticmethod(mag_mul)
+    sqr = staticmethod(mag_sqr)
+    divmod = staticmethod(mag_divmod)
+    pow = staticmethod(mag_pow)
+    root = staticmethod(mag_root)
+    gcdext = staticmethod(mag_gcdext)
+
+
+def _int_root(x, k):
+    if k == 1 or x < 2:
+        return x
+    if k == 2:
+        return math.isqrt(x)
+    n = x.bit_length()
+    if n <= k:
+        return 1
+    b = -(-n // k)
+    if b <= 48:
+        h = max(n - 64, 0)
+        r = int(2 ** ((math.log2(x >> h) + h) / k))
+        while (r + 1) ** k <= x:
+            r += 1
+        while r ** k > x:
+            r -= 1
+        return r
+    s = b // 2
+    r = (_int_root(x >> (k * s), k) + 1) << s
+    while True:
+        y = ((k - 1) * r + x // r ** (k - 1)) // k
+        if y >= r:
+            return r
+        r = y
+
+
+def _int_gcdext(a, b):
+    u0, u1 = 1, 0
+    while b:
+        q, r = divmod(a, b)
+        a, b = b, r
+        u0, u1 = u1, u0 - q * u1
+    return a, u0
+
+
+class IntBackend:
+
+    name = 'int'
+
+    @staticmethod
+    def _to(a):
+        return mag_to_int(a)
+
+    @staticmethod
+    def _from(x):
+        return mag_from_int(int(x))
+
+    def add(self, a, b):
+        return self._from(self._to(a) + self._to(b))
+
+    def sub(self, a, b):
+        return self._from(self._to(a) - self._to(b))
+
+    def mul(self, a, b):
+        return self._from(self._to(a) * self._to(b))
+
+    def sqr(self, a):
+        x = self._to(a)
+        return self._from(x * x)
+
+    def divmod(self, a, b):
+        q, r = divmod(self._to(a), self._to(b))
+        return self._from(q), self._from(r)
+
+    def pow(self, a, e):
+        return self._from(self._to(a) ** self._to(e))
+
+    def powmod(self, a, e, n):
+        return self._from(pow(self._to(a), self._to(e), self._to(n)))
+
+    def root(self, a, k):
+        return self._from(_int_root(self._to(a), k))
+
+    def _gcdext(self, x, y):
+        d, u = _int_gcdext(x, y)
+        return d, u, (d - u * x) // y if y else 0
+
+    def gcdext(self, a, b):
+        # same contract as mag_gcdext: u and v are (is_neg, limbs) pairs
+        d, u, v = self._gcdext(self._to(a), self._to(b))
+        u = u < 0, self._from(abs(u))
+        v = v < 0, self._from(abs(v))
+        return self._from(d), u, v
+
+
+class Gmpy2Backend(IntBackend):
+
+    name = 'gmpy2'
+
+    def __init__(self):
+        if gmpy2 is None:
+            raise ImportError('the gmpy2 backend requires gmpy2')
+
+    @staticmethod
+    def _to(a):
+        return gmpy2.mpz(mag_to_int(a))
+
+    def powmod(self, a, e, n):
+        return self._from(gmpy2.powmod(self._to(a), self._to(e), self._to(n)))
+
+    def root(self, a, k):
+        return self._from(gmpy2.iroot(self._to(a), k)[0])
+
+    def _gcdext(self, x, y):
+        return gmpy2.gcdext(x, y)
+
+
+BACKENDS = {
+    'limb': LimbBackend,
+    'int': IntBackend,
+    'gmpy2': Gmpy2Backend,
+}
+
+current = None
+
+
+def set_backend(backend):
+    global current
+    if isinstance(backend, str):
+        if backend not in BACKENDS:
+            raise ValueError(f'unknown backend: "{backend}"')
+        backend = BACKENDS[backend]()
+    current = backend
+    return backend
+
+
+def get_backend():
+    return current
+
+
+@contextmanager
+def using_backend(backend):
+    previous = current
+    try:
+        yield set_backend(backend)
+    finally:
+        set_backend(previous)
+
+
+set_backend(os.environ.get('BIGINT_BACKEND', 'limb'))
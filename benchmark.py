@@ -0,0 +1,281 @@
+import argparse
+import json
+import math
+import platform
+import random
+import sys
+import time
+from contextlib import contextmanager
+
+import backend
+import long_math
+from bigint import BigInt
+from long_math import (from_dec, l_add, l_divmod, l_mul, l_pow, l_root, l_sqr,
+                       l_sub, mag_divmod, mag_mul, mag_sqr, to_dec)
+
+# runs shorter than this are repeated in a loop so that the timer resolution
+# does not dominate
+MIN_TIME = 0.05
+
+
+def digits(n, rng=random):
+    return str(rng.randint(1, 9)) + ''.join(rng.choices('0123456789', k=n - 1))
+
+
+def sizes(max_digits, min_digits=10):
+    # 10, 20, 50, 100, 200, 500, ...
+    n = min_digits
+    while n <= max_digits:
+        for m in (1, 2, 5):
+            if min_digits <= n * m <= max_digits:
+                yield n * m
+        n *= 10
+
+
+def measure(fn, args, repeat=3):
+    # best time per call
+    best = math.inf
+    loops = 1
+    for _ in range(repeat):
+        start = time.perf_counter()
+        for _ in range(loops):
+            fn(*args)
+        t = (time.perf_counter() - start) / loops
+        best = min(best, t)
+        if t * loops < MIN_TIME:
+            loops = max(1, min(1000, int(MIN_TIME / max(t, 1e-9))))
+    return best
+
+
+def fit_exponent(points, min_seconds=1e-4):
+    # least-squares slope of log(seconds) over log(digits)
+    points = [(math.log(n), math.log(t))
+              for n, t in points if t >= min_seconds]
+    if len(points) < 2:
+        return None
+    mx = sum(x for x, _ in points) / len(points)
+    my = sum(y for _, y in points) / len(points)
+    sxx = sum((x - mx) ** 2 for x, _ in points)
+    if not sxx:
+        return None
+    return sum((x - mx) * (y - my) for x, y in points) / sxx
+
+
+@contextmanager
+def cutoffs(**values):
+    saved = {name: getattr(long_math, name) for name in values}
+    for name, value in values.items():
+        setattr(long_math, name, value)
+    try:
+        yield
+    finally:
+        for name, value in saved.items():
+            setattr(long_math, name, value)
+
+
+def _big(n, rng):
+    return BigInt(digits(n, rng))
+
+
+def _sub_args(n, rng):
+    s1, s2 = digits(n, rng), digits(n, rng)
+    return (s1, s2) if long_math.less_than(s2, s1) else (s2, s1)
+
+
+def _limbs(n, rng):
+    return from_dec(digits(n, rng))
+
+
+def _divmod_args(n, rng):
+    return _limbs(2 * n, rng), _limbs(n, rng)
+
+
+# name: (function, argument builder for an n-digit size)
+OPERATIONS = {
+    'l_add': (l_add, lambda n, rng: (digits(n, rng), digits(n, rng))),
+    'l_sub': (l_sub, _sub_args),
+    'l_mul': (l_mul, lambda n, rng: (digits(n, rng), digits(n, rng))),
+    'l_sqr': (l_sqr, lambda n, rng: (digits(n, rng),)),
+    'l_divmod': (l_divmod,
+                 lambda n, rng: (digits(2 * n, rng), digits(n, rng))),
+    'l_pow': (l_pow, lambda n, rng: (digits(max(1, n // 8), rng), '8')),
+    'l_root': (l_root, lambda n, rng: (digits(n, rng), '3')),
+    'from_dec': (from_dec, lambda n, rng: (digits(n, rng),)),
+    'to_dec': (to_dec, lambda n, rng: (_limbs(n, rng),)),
+    'gcd': (BigInt.gcd, lambda n, rng: (_big(n, rng), _big(n, rng))),
+    'bin_gcd': (BigInt.bin_gcd, lambda n, rng: (_big(n, rng), _big(n, rng))),
+    'lsbgcd': (BigInt.lsbgcd, lambda n, rng: (_big(n, rng), _big(n, rng))),
+    'ring_pow': (BigInt.ring_pow,
+                 lambda n, rng: (_big(n, rng), _big(n, rng), _big(n, rng))),
+}
+
+_INF = sys.maxsize
+
+# algorithm variants compared on the same operands; the crossover is the
+# first size from which the second variant stays faster than the first
+VARIANTS = {
+    'mul': (mag_mul, lambda n, rng: (_limbs(n, rng), _limbs(n, rng)), {
+        'schoolbook': {'KARATSUBA_CUTOFF': _INF},
+        'karatsuba': {'KARATSUBA_CUTOFF': 2, 'TOOM3_CUTOFF': _INF},
+        'toom3': {'KARATSUBA_CUTOFF': 2, 'TOOM3_CUTOFF': 3},
+    }),
+    'sqr': (mag_sqr, lambda n, rng: (_limbs(n, rng),), {
+        'schoolbook': {'KARATSUBA_SQR_CUTOFF': _INF},
+        'karatsuba': {'KARATSUBA_SQR_CUTOFF': 2, 'TOOM3_SQR_CUTOFF': _INF},
+        'toom3': {'KARATSUBA_SQR_CUTOFF': 2, 'TOOM3_SQR_CUTOFF': 3},
+    }),
+    'divmod': (mag_divmod, _divmod_args, {
+        'knuth': {'BURNIKEL_ZIEGLER_CUTOFF': _INF},
+        'burnikel_ziegler': {'BURNIKEL_ZIEGLER_CUTOFF': 2},
+    }),
+    'to_dec': (to_dec, lambda n, rng: (_limbs(n, rng),), {
+        'basic': {'DEC_CONVERSION_CUTOFF': _INF},
+        'divide_and_conquer': {'DEC_CONVERSION_CUTOFF': 2},
+    }),
+}
+
+GCD_VARIANTS = ('gcd', 'bin_gcd', 'lsbgcd')
+
+
+def sweep(fn, build, max_digits, time_limit, repeat, seed, min_digits=10):
+    # stops growing once a single call takes longer than time_limit
+    rng = random.Random(seed)
+    points = []
+    for n in sizes(max_digits, min_digits):
+        t = measure(fn, build(n, rng), repeat)
+        points.append((n, t))
+        if t > time_limit:
+            break
+    return points
+
+
+def crossover(first, second):
+    # smallest size from which second is faster than first at every
+    # measured size
+    faster = None
+    for (n, a), (_, b) in zip(first, second):
+        if b < a:
+            faster = n if faster is None else faster
+        else:
+            faster = None
+    return faster
+
+
+def _series(points):
+    return {
+        'digits': [n for n, _ in points],
+        'seconds': [t for _, t in points],
+        'exponent': fit_exponent(points),
+    }
+
+
+def run(operations=None, variants=None, max_digits=10 ** 4, time_limit=2.0,
+        repeat=3, seed=0):
+    operations = list(OPERATIONS) if operations is None else operations
+    variants = list(VARIANTS) if variants is None else variants
+    results = {}
+    for name in operations:
+        fn, build = OPERATIONS[name]
+        points = sweep(fn, build, max_digits, time_limit, repeat, seed)
+        results[name] = _series(points)
+    compared = {}
+    for name in variants:
+        fn, build, options = VARIANTS[name]
+        series = {}
+        for variant, values in options.items():
+            with cutoffs(**values):
+                series[variant] = sweep(fn, build, max_digits, time_limit,
+                                        repeat, seed)
+        names = list(options)
+        compared[name] = {
+            'variants': {v: _series(p) for v, p in series.items()},
+            'crossovers': {f'{a}->{b}': crossover(series[a], series[b])
+                           for a, b in zip(names, names[1:])},
+        }
+    gcds = [g for g in GCD_VARIANTS if g in results]
+    if len(gcds) > 1:
+        fastest = {}
+        for i, n in enumerate(results[gcds[0]]['digits']):
+            timed = [(results[g]['seconds'][i], g) for g in gcds
+                     if i < len(results[g]['seconds'])]
+            fastest[n] = min(timed)[1]
+        compared['gcd'] = {'fastest': fastest}
+    return {
+        'meta': {
+            'python': platform.python_version(),
+            'machine': platform.machine(),
+            'backend': backend.get_backend().name,
+            'max_digits': max_digits,
+            'seed': seed,
+        },
+        'operations': results,
+        'variants': compared,
+    }
+
+
+def regressions(baseline, current, tolerance=1.25):
+    # (operation, digits, ratio) wherever current is slower than the baseline
+    # by more than the tolerance factor
+    found = []
+    for name, new in current['operations'].items():
+        old = baseline.get('operations', {}).get(name)
+        if not old:
+            continue
+        old_times = dict(zip(old['digits'], old['seconds']))
+        for n, t in zip(new['digits'], new['seconds']):
+            if n in old_times and t > tolerance * old_times[n]:
+                found.append((name, n, t / old_times[n]))
+    return found
+
+
+def _report(results):
+    for name, series in results['operations'].items():
+        exponent = series['exponent']
+        exponent = '-' if exponent is None else f'{exponent:.2f}'
+        largest = series['digits'][-1] if series['digits'] else '-'
+        print(f'{name:<12} exponent {exponent:>5}  up to {largest} digits')
+    for name, compared in results['variants'].items():
+        for pair, n in compared.get('crossovers', {}).items():
+            found = 'none' if n is None else f'{n} digits'
+            print(f'{name:<12} {pair}: {found}')
+        if 'fastest' in compared:
+            print(f'{name:<12} fastest: {compared["fastest"]}')
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(
+        description='Benchmark long_math and BigInt primitives.')
+    parser.add_argument('--max-digits', type=int, default=10 ** 4)
+    parser.add_argument('--time-limit', type=float, default=2.0,
+                        help='stop growing an operation once one call '
+                             'takes this long')
+    parser.add_argument('--repeat', type=int, default=3)
+    parser.add_argument('--seed', type=int, default=0)
+    parser.add_argument('--ops', nargs='*', choices=list(OPERATIONS))
+    parser.add_argument('--variants', nargs='*', choices=list(VARIANTS))
+    parser.add_argument('--backend', choices=list(backend.BACKENDS))
+    parser.add_argument('-o', '--output', help='write the results as JSON')
+    parser.add_argument('--compare',
+                        help='baseline JSON to check for regressions')
+    parser.add_argument('--tolerance', type=float, default=1.25)
+    args = parser.parse_args(argv)
+
+    if args.backend:
+        backend.set_backend(args.backend)
+    results = run(args.ops, args.variants, args.max_digits, args.time_limit,
+                  args.repeat, args.seed)
+    _report(results)
+    if args.output:
+        with open(args.output, 'w') as f:
+            json.dump(results, f, indent=2)
+    if args.compare:
+        with open(args.compare) as f:
+            found = regressions(json.load(f), results, args.tolerance)
+        for name, n, ratio in found:
+            print(f'regression: {name} at {n} digits is {ratio:.2f}x slower')
+        return 1 if found else 0
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -1,28 +1,100 @@
-from long_math import (dec_to_bin, is_even, l_add, l_divmod, l_mul, l_pow,
-                       l_root, l_sub)
+import operator
+import os
+import random
+import sys
+from array import array
+from concurrent.futures import ProcessPoolExecutor
+from functools import lru_cache, wraps
+from itertools import repeat
+
+import backend
+import long_math
+from long_math import (BASE, MASK, SHIFT, from_dec, mag_add, mag_and,
+                       mag_bit_length, mag_cmp, mag_divmod,
+                       mag_divmod_reciprocal, mag_from_int, mag_iadd,
+                       mag_imul_small, mag_irshift, mag_is_even,
+                       mag_is_perfect_power, mag_isub, mag_less_than,
+                       mag_lshift, mag_mul, mag_normalize, mag_or,
+                       mag_reciprocal, mag_redc, mag_rshift, mag_sqr, mag_sub,
+                       mag_to_bin, mag_to_int, mag_trailing_zeros, to_dec,
+                       window_multi_pow, window_pow, window_size)
+
+
+def _coerced(method):
+    @wraps(method)
+    def wrapper(self, other):
+        if not isinstance(other, BigInt):
+            if not isinstance(other, int):
+                return NotImplemented
+            other = BigInt.from_int(other)
+        return method(self, other)
+    return wrapper
 
 
 class BigInt:
 
+    __slots__ = ('is_neg', 'limbs', '_value')
+
     def __init__(self, value='0'):
         if not isinstance(value, str):
             t = type(value).__name__
             raise TypeError(f'BigInt() argument must be a string, not "{t}"')
 
-        if value == '-0':
-            value = '0'
-
-        self.is_neg = value[0] == '-'
-        self.value = value[self.is_neg:]
+        is_neg = value[:1] == '-'
+        digits = value[is_neg:]
 
-        if not self.value.isdigit():
+        if not digits.isdigit():
             raise TypeError(f'invalid argument for BigInt(): "{value}"')
 
+        self.limbs = from_dec(digits)
+        self.is_neg = is_neg and bool(self.limbs)
+        self._value = None
+
+    @classmethod
+    def _new(cls, limbs, is_neg=False):
+        self = object.__new__(cls)
+        self.limbs = limbs
+        self.is_neg = is_neg and bool(limbs)
+        self._value = None
+        return self
+
+    @classmethod
+    def from_int(cls, x):
+        if SMALL_INT_MIN <= x < SMALL_INT_MAX:
+            return _SMALL_INTS[x - SMALL_INT_MIN]
+        return BigInt._new(mag_from_int(abs(x)), x < 0)
+
+    @classmethod
+    def from_bytes(cls, data, byteorder='big', *, signed=False):
+        return BigInt.from_int(int.from_bytes(data, byteorder, signed=signed))
+
+    def to_bytes(self, length=1, byteorder='big', *, signed=False):
+        return int(self).to_bytes(length, byteorder, signed=signed)
+
+    @classmethod
+    def from_limbs(cls, buffer, is_neg=False):
+        # native-endian 32-bit limbs, least significant first
+        limbs = array('I')
+        limbs.frombytes(memoryview(buffer).cast('B'))
+        return BigInt._new(mag_normalize(limbs), is_neg)
+
+    def limb_view(self):
+        return memoryview(self.limbs).toreadonly()
+
+    def __buffer__(self, flags):
+        return self.limb_view()
+
+    @property
+    def value(self):
+        if self._value is None:
+            self._value = to_dec(self.limbs)
+        return self._value
+
     def __abs__(self):
-        return BigInt(self.value)
+        return BigInt._new(self.limbs)
 
     def __bool__(self):
-        return self.value != '0'
+        return bool(self.limbs)
 
     def __repr__(self):
         return self.__str__()
@@ -33,148 +105,203 @@ class BigInt:
     def __len__(self):
         return len(self.value)
 
+    def __int__(self):
+        x = mag_to_int(self.limbs)
+        return -x if self.is_neg else x
+
+    __index__ = __int__
+
+    @_coerced
     def __eq__(self, other):
-        if isinstance(other, int):
-            other = BigInt(str(other))
-        return self.value == other.value and self.is_neg == other.is_neg
+        return self.limbs == other.limbs and self.is_neg == other.is_neg
 
+    @_coerced
     def __ne__(self, other):
-        if isinstance(other, int):
-            other = BigInt(str(other))
         return not self == other
 
+    def __hash__(self):
+        return hash(int(self))
+
+    def _cmp(self, other):
+        if self.is_neg != other.is_neg:
+            return -1 if self.is_neg else 1
+        c = mag_cmp(self.limbs, other.limbs)
+        return -c if self.is_neg else c
+
+    @_coerced
     def __lt__(self, other):
-        if self.is_neg == other.is_neg:
-            self_len = len(self)
-            other_len = len(other)
-            if self_len == other_len:
-                return (self.value < other.value) ^ self.is_neg
-            return (self_len < other_len) ^ self.is_neg
-        return self.is_neg
+        return self._cmp(other) < 0
 
+    @_coerced
     def __le__(self, other):
-        return self < other or self == other
+        return self._cmp(other) <= 0
 
+    @_coerced
     def __gt__(self, other):
-        return not self <= other
+        return self._cmp(other) > 0
 
+    @_coerced
     def __ge__(self, other):
-        return not self < other
+        return self._cmp(other) >= 0
 
     def __pos__(self):
-        return BigInt(('-' if self.is_neg else '') + self.value)
+        return BigInt._new(self.limbs, self.is_neg)
 
     def __neg__(self):
-        return BigInt(('' if self.is_neg else '-') + self.value)
+        return BigInt._new(self.limbs, not self.is_neg)
 
+    @_coerced
     def __add__(self, other):
+        engine = backend.current
         if self.is_neg == other.is_neg:
-            result = l_add(self.value, other.value)
-            return BigInt(('-' if self.is_neg else '') + result)
-        x, y = sorted((abs(self), abs(other)))
-        neg = max((self, other), key=lambda e: abs(e)).is_neg
-        return BigInt(('-' if neg else '') + (y - x).value)
-
+            result = engine.add(self.limbs, other.limbs)
+            return BigInt._new(result, self.is_neg)
+        if mag_less_than(self.limbs, other.limbs):
+            result = engine.sub(other.limbs, self.limbs)
+            return BigInt._new(result, other.is_neg)
+        return BigInt._new(engine.sub(self.limbs, other.limbs), self.is_neg)
+
+    @_coerced
     def __sub__(self, other):
-        if not self.is_neg and not other.is_neg:
-            y, x = sorted((self, other))
-            result = l_sub(x.value, y.value)
-            return BigInt(('-' if self < other else '') + result)
-
-        if self.is_neg and not other.is_neg:
-            return BigInt('-' + (abs(self) + abs(other)).value)
-
-        if not self.is_neg and other.is_neg:
-            return BigInt((abs(self) + abs(other)).value)
-
-        if self.is_neg and other.is_neg:
-            return self + abs(other)
+        return self + BigInt._new(other.limbs, not other.is_neg)
 
+    @_coerced
     def __mul__(self, other):
-        result = l_mul(self.value, other.value)
-        return BigInt(('-' if self.is_neg != other.is_neg else '') + result)
+        result = backend.current.mul(self.limbs, other.limbs)
+        return BigInt._new(result, self.is_neg != other.is_neg)
 
+    @_coerced
     def __truediv__(self, other):
-        if other.value == '0':
+        if not other.limbs:
             raise ZeroDivisionError('division by zero')
-        result = l_divmod(self.value, other.value)[0]
-        return BigInt(('' if self.is_neg == other.is_neg else '-') + result)
+        result = backend.current.divmod(self.limbs, other.limbs)[0]
+        return BigInt._new(result, self.is_neg != other.is_neg)
 
+    @_coerced
     def __mod__(self, other):
-        if other.value == '0':
+        if not other.limbs:
             raise ZeroDivisionError('division by zero')
-        mod = l_divmod(self.value, other.value)[1]
-        mod = BigInt(mod)
+        mod = backend.current.divmod(self.limbs, other.limbs)[1]
+        if not mod or self.is_neg == other.is_neg:
+            return BigInt._new(mod, other.is_neg)
+        return BigInt._new(mag_sub(other.limbs, mod), other.is_neg)
 
-        if mod.value == '0':
-            return mod
+    @_coerced
+    def __pow__(self, other):
+        result = backend.current.pow(self.limbs, other.limbs)
+        if not mag_is_even(other.limbs):
+            return BigInt._new(result, self.is_neg)
+        return BigInt._new(result)
 
-        return {
-            not self.is_neg and not other.is_neg: mod,
-            self.is_neg and not other.is_neg: other - mod,
-            not self.is_neg and other.is_neg: mod + other,
-            self.is_neg and other.is_neg: -mod
-        }[True]
+    def __radd__(self, other):
+        return self + other
 
-    def __pow__(self, other):
-        result = l_pow(self.value, other.value)
-        if int(other.value[-1]) % 2:
-            return BigInt(('-' if self.is_neg else '') + result)
-        return BigInt(result)
+    def __rmul__(self, other):
+        return self * other
+
+    def __rand__(self, other):
+        return self & other
+
+    def __ror__(self, other):
+        return self | other
+
+    @_coerced
+    def __rsub__(self, other):
+        return other - self
+
+    @_coerced
+    def __rtruediv__(self, other):
+        return other / self
+
+    @_coerced
+    def __rmod__(self, other):
+        return other % self
+
+    @_coerced
+    def __rpow__(self, other):
+        return other ** self
+
+    def __lshift__(self, n):
+        result = mag_lshift(self.limbs, _shift_count(n))
+        return BigInt._new(result, self.is_neg)
+
+    def __rshift__(self, n):
+        n = _shift_count(n)
+        if not self.is_neg:
+            return BigInt._new(mag_rshift(self.limbs, n))
+        # floor division by 2**n, as for int
+        m = mag_rshift(mag_sub(self.limbs, _ONE), n)
+        return BigInt._new(mag_add(m, _ONE), True)
+
+    @_coerced
+    def __and__(self, other):
+        return _bitwise(self, other, operator.and_, mag_and)
+
+    @_coerced
+    def __or__(self, other):
+        return _bitwise(self, other, operator.or_, mag_or)
+
+    def bit_length(self):
+        return mag_bit_length(self.limbs)
+
+    def trailing_zeros(self):
+        return mag_trailing_zeros(self.limbs)
 
     @staticmethod
     def root(a, b):
-        result = l_root(a.value, b.value)
-        return BigInt(result)
+        k = int(b)
+        if k < 1:
+            raise ValueError('root degree must be positive')
+        if a.is_neg and not k & 1:
+            raise ValueError('even root of a negative number')
+        return BigInt._new(backend.current.root(a.limbs, k), a.is_neg)
+
+    @staticmethod
+    def isqrt(a):
+        if a.is_neg:
+            raise ValueError('isqrt() argument must be nonnegative')
+        return BigInt._new(backend.current.root(a.limbs, 2))
+
+    def is_perfect_power(self):
+        return mag_is_perfect_power(self.limbs, self.is_neg)
 
     @staticmethod
     def gcd(a, b):
-        if a.value == '0':
-            return b
-        if b.value == '0':
-            return a
-        a = BigInt(a.value)
-        b = BigInt(b.value)
-        zero, one = BigInt('0'), BigInt('1')
-        r, old_r = a, b
-        s, old_s = zero, one
-        t, old_t = one, zero
-        while r:
-            q = old_r / r
-            old_r, r = r, old_r - q * r
-            old_s, s = s, old_s - q * s
-            old_t, t = t, old_t - q * t
-        return old_r, old_t, old_s
+        if not a:
+            return +b
+        if not b:
+            return +a
+        if not mag_cmp(a.limbs, b.limbs):
+            # the Euclid step that stops at once gives (a, 1, 0)
+            return (BigInt._new(array('I', a.limbs)), BigInt.from_int(1),
+                    BigInt.from_int(0))
+        d, u, v = backend.current.gcdext(a.limbs, b.limbs)
+        return BigInt._new(d), BigInt._new(u[1], u[0]), BigInt._new(v[1], v[0])
 
     @staticmethod
     def bin_gcd(a, b):
-        a = BigInt(a.value)
-        b = BigInt(b.value)
-        zero, one, two = BigInt('0'), BigInt('1'), BigInt('2')
-        g = one
-        while is_even(a.value) and is_even(b.value):
-            a /= two
-            b /= two
-            g *= two
-        x, y = a, b
-        A, B, C, D = one, zero, zero, one
+        a = abs(a)
+        b = abs(b)
+        k = min(a.trailing_zeros(), b.trailing_zeros())
+        a >>= k
+        b >>= k
+        x, y = MutableBigInt(a), MutableBigInt(b)
+        A, B, C, D = map(MutableBigInt, (1, 0, 0, 1))
         while x:
-            while is_even(x.value):
-                x /= two
-                if is_even(A.value) and is_even(B.value):
-                    A /= two
-                    B /= two
-                else:
-                    A = (A + b) / two
-                    B = (B - a) / two
-            while is_even(y.value):
-                y /= two
-                if is_even(C.value) and is_even(D.value):
-                    C /= two
-                    D /= two
-                else:
-                    C = (C + b) / two
-                    D = (D - a) / two
+            while mag_is_even(x.limbs):
+                x >>= 1
+                if not mag_is_even(A.limbs) or not mag_is_even(B.limbs):
+                    A += b
+                    B -= a
+                A >>= 1
+                B >>= 1
+            while mag_is_even(y.limbs):
+                y >>= 1
+                if not mag_is_even(C.limbs) or not mag_is_even(D.limbs):
+                    C += b
+                    D -= a
+                C >>= 1
+                D >>= 1
             if x < y:
                 y -= x
                 C -= A
@@ -183,45 +310,37 @@ class BigInt:
                 x -= y
                 A -= C
                 B -= D
-        return g * y, C, D
+        return y << k, C.freeze(), D.freeze()
 
     @staticmethod
     def lsbgcd(a, b):
-        a = BigInt(a.value)
-        b = BigInt(b.value)
+        a = abs(a)
+        b = abs(b)
         is_swap = False
         if b > a:
             a, b = b, a
             is_swap = True
-        zero, one, two = BigInt('0'), BigInt('1'), BigInt('2')
+        zero, one = BigInt.from_int(0), BigInt.from_int(1)
         x, y = a, b
         A, B, C, D = one, zero, zero, one
-        log2_10 = BigInt('3')
-        n = log2_10 * BigInt(str(len(y)))
         while y:
-            two_n = two ** n
-            left = two_n * y
-            right = two_n * two * y
-            while True:
-                if left <= x < right:
-                    break
-                if x < left:
-                    n -= one
-                if x >= right:
-                    n += one
-                two_n = two ** n
-                left = two_n * y
-                right = two_n * two * y
+            # 2**n * y <= x < 2**(n + 1) * y
+            n = x.bit_length() - y.bit_length()
+            left = y << n
+            if x < left:
+                n -= 1
+                left = y << n
+            right = left << 1
             s = x - left
             p = right - x
             if s <= p:
                 t = s
-                At = A - two_n * C
-                Bt = B - two_n * D
+                At = A - (C << n)
+                Bt = B - (D << n)
             else:
                 t = p
-                At = two_n * two * C - A
-                Bt = two_n * two * D - B
+                At = (C << (n + 1)) - A
+                Bt = (D << (n + 1)) - B
             if t <= y:
                 x = y
                 y = t
@@ -236,8 +355,8 @@ class BigInt:
 
     @staticmethod
     def ring_add(x, y, n):
-        r1 = x % n
-        r2 = y % n
+        r1 = _ring_reduce(x, n)
+        r2 = _ring_reduce(y, n)
         z = r1 + r2
         if z >= n:
             z -= n
@@ -245,51 +364,509 @@ class BigInt:
 
     @staticmethod
     def ring_sub(x, y, n):
-        r1 = x % n
-        r2 = y % n
+        r1 = _ring_reduce(x, n)
+        r2 = _ring_reduce(y, n)
         z = r1 - r2
-        if z < BigInt('0'):
+        if z < 0:
             z += n
         return z
 
     @staticmethod
     def ring_mul(x, y, n):
-        r1 = x % n
-        r2 = y % n
+        r1 = _ring_reduce(x, n)
+        r2 = _ring_reduce(y, n)
         z = r1 * r2
-        return z % n
+        return _ring_reduce(z, n)
 
     @staticmethod
     def ring_inv(x, n):
-        if x.value == '1':
-            return x
-        d, v, u = BigInt.lsbgcd(x, n)
-        if d != BigInt('1'):
+        # gcd works on magnitudes, so invert modulo |n| and let the final
+        # % put the result on the side of n, as pow(x, -1, n) does
+        x = x % abs(n)
+        if not x:
             return None
-        zero = BigInt('0')
-        while True:
-            if u > n:
-                u -= n
-            if u < zero:
-                u += n
-            if zero < u < n:
+        d, u, _ = BigInt.gcd(x, abs(n))
+        if d != 1:
+            return None
+        return u % n
+
+    @staticmethod
+    def ring_pow(x, m, n, factors=None):
+        if factors is not None:
+            ctx = factors
+            if not isinstance(ctx, CRTContext):
+                ctx = CRTContext.cached(factors)
+            if ctx.n != n:
+                raise ValueError('the factors do not multiply to the modulus')
+            if backend.current.powmod is None:
+                return ctx.pow(x, m)
+        if not m:
+            return BigInt.from_int(1)
+        if n and not n.is_neg:
+            if backend.current.powmod is not None:
+                return _powmod(x, m, n)
+            return ModulusContext.for_modulus(n).pow(x, m)
+        return window_pow(x % n, m.limbs, None,
+                          lambda a, b: (a * b) % n,
+                          lambda a: BigInt._new(mag_sqr(a.limbs)) % n)
+
+    @staticmethod
+    def ring_multi_pow(pairs, n):
+        # prod(x ** m for x, m in pairs) mod n
+        if n and not n.is_neg:
+            if backend.current.powmod is not None:
+                z = BigInt.from_int(1) % n
+                for x, m in pairs:
+                    z = z * _powmod(x, m, n) % n
+                return z
+            return ModulusContext.for_modulus(n).multi_pow(pairs)
+        return window_multi_pow([(x % n, m.limbs) for x, m in pairs],
+                                BigInt.from_int(1),
+                                lambda a, b: (a * b) % n,
+                                lambda a: BigInt._new(mag_sqr(a.limbs)) % n)
+
+    @staticmethod
+    def ring_pow_many(bases, exps, n, workers=None):
+        bases, exps = list(bases), list(exps)
+        if len(bases) != len(exps):
+            raise ValueError(
+                'ring_pow_many() needs as many exponents as bases')
+        items = [_pack(x) + _pack(m) for x, m in zip(bases, exps)]
+        workers = workers or os.cpu_count() or 1
+        size = -(-len(items) // (4 * workers)) or 1
+        chunks = [items[i:i + size] for i in range(0, len(items), size)]
+        args = (_ring_pow_chunk, repeat(_pack(n)), chunks)
+        if workers == 1 or len(chunks) < 2:
+            results = map(*args)
+        else:
+            with ProcessPoolExecutor(workers) as pool:
+                results = list(pool.map(*args))
+        return [_unpack(*r) for chunk in results for r in chunk]
+
+
+class MutableBigInt(BigInt):
+
+    __slots__ = ()
+    __hash__ = None
+
+    def __init__(self, value='0'):
+        if isinstance(value, int):
+            value = BigInt.from_int(value)
+        if not isinstance(value, BigInt):
+            super().__init__(value)
+            return
+        self.limbs = array('I', value.limbs)
+        self.is_neg = value.is_neg
+        self._value = None
+
+    def freeze(self):
+        return BigInt._new(array('I', self.limbs), self.is_neg)
+
+    def __abs__(self):
+        return BigInt._new(array('I', self.limbs))
+
+    def __pos__(self):
+        return self.freeze()
+
+    def __neg__(self):
+        return BigInt._new(array('I', self.limbs), not self.is_neg)
+
+    def _iadd(self, limbs, is_neg):
+        a = self.limbs
+        if self.is_neg == is_neg:
+            mag_iadd(a, limbs)
+        elif mag_less_than(a, limbs):
+            a[:] = mag_sub(limbs, a)
+            self.is_neg = is_neg
+        else:
+            mag_isub(a, limbs)
+        self.is_neg = self.is_neg and bool(a)
+        self._value = None
+        return self
+
+    @_coerced
+    def __iadd__(self, other):
+        return self._iadd(other.limbs, other.is_neg)
+
+    @_coerced
+    def __isub__(self, other):
+        return self._iadd(other.limbs, not other.is_neg)
+
+    @_coerced
+    def __imul__(self, other):
+        if len(other.limbs) == 1:
+            mag_imul_small(self.limbs, other.limbs[0])
+        else:
+            self.limbs = mag_mul(self.limbs, other.limbs)
+        self.is_neg = self.is_neg != other.is_neg and bool(self.limbs)
+        self._value = None
+        return self
+
+    def __ilshift__(self, n):
+        self.limbs = mag_lshift(self.limbs, _shift_count(n))
+        self._value = None
+        return self
+
+    def __irshift__(self, n):
+        n = _shift_count(n)
+        if self.is_neg:
+            mag_iadd(mag_irshift(mag_isub(self.limbs, _ONE), n), _ONE)
+        else:
+            mag_irshift(self.limbs, n)
+        self._value = None
+        return self
+
+
+_ONE = array('I', [1])
+
+
+def _shift_count(n):
+    n = int(n)
+    if n < 0:
+        raise ValueError('negative shift count')
+    return n
+
+
+def _twos(x, width):
+    # two's complement limbs of x over width limbs
+    if not x.is_neg:
+        return x.limbs + array('I', [0]) * (width - len(x.limbs))
+    r = mag_sub(x.limbs, _ONE)
+    r.extend([0] * (width - len(r)))
+    return array('I', (~e & MASK for e in r))
+
+
+def _bitwise(x, y, op, mag_op):
+    if not x.is_neg and not y.is_neg:
+        return BigInt._new(mag_op(x.limbs, y.limbs))
+    width = max(len(x.limbs), len(y.limbs)) + 1
+    r = array('I', map(op, _twos(x, width), _twos(y, width)))
+    if not op(x.is_neg, y.is_neg):
+        return BigInt._new(mag_normalize(r))
+    r = mag_normalize(array('I', (~e & MASK for e in r)))
+    return BigInt._new(mag_add(r, _ONE), True)
+
+
+SMALL_INT_MIN = -5
+SMALL_INT_MAX = 257
+_SMALL_INTS = [BigInt._new(mag_from_int(abs(i)), i < 0)
+               for i in range(SMALL_INT_MIN, SMALL_INT_MAX)]
+
+
+def _pack(x):
+    return x.limbs.tobytes(), x.is_neg
+
+
+def _unpack(data, is_neg):
+    return BigInt._new(array('I', data), is_neg)
+
+
+def _ring_pow_chunk(n, items):
+    n = _unpack(*n)
+    results = []
+    for x, x_neg, m, m_neg in items:
+        z = BigInt.ring_pow(_unpack(x, x_neg), _unpack(m, m_neg), n)
+        results.append(_pack(z))
+    return results
+
+
+CONTEXT_CACHE_SIZE = 64
+
+
+@lru_cache(maxsize=CONTEXT_CACHE_SIZE)
+def _cached_context(cls, key):
+    return cls(BigInt._new(array('I', key)))
+
+
+@lru_cache(maxsize=CONTEXT_CACHE_SIZE)
+def _cached_crt(factors):
+    return CRTContext(factors)
+
+
+@lru_cache(maxsize=CONTEXT_CACHE_SIZE)
+def _cached_inv(x, n):
+    return BigInt.ring_inv(x, n)
+
+
+def _powmod(x, m, n):
+    # through the backend's own modular power, for a positive n
+    return BigInt._new(backend.current.powmod((x % n).limbs, m.limbs, n.limbs))
+
+
+# Miller-Rabin with these bases is exact below 3.3 * 10 ** 24
+_PRIME_BASES = (2, 3, 5, 7, 11, 13, 17, 19, 23, 29, 31, 37)
+
+
+def _is_probable_prime(n):
+    if n < 2:
+        return False
+    for p in _PRIME_BASES:
+        if n == p:
+            return True
+        if not n % p:
+            return False
+    bases = list(_PRIME_BASES)
+    if n.bit_length() > 81:
+        rng = random.Random(int(n))
+        bases += [rng.randrange(41, BASE) for _ in range(8)]
+    minus_one = n - 1
+    s = minus_one.trailing_zeros()
+    d = minus_one >> s
+    for a in bases:
+        x = BigInt.ring_pow(BigInt.from_int(a), d, n)
+        if x == 1 or x == minus_one:
+            continue
+        for _ in range(s - 1):
+            x = BigInt.ring_mul(x, x, n)
+            if x == minus_one:
                 break
-        return u
+        else:
+            return False
+    return True
+
+
+def _ring_reduce(x, n):
+    if n.is_neg or len(n.limbs) < long_math.BARRETT_CUTOFF:
+        if not x.is_neg and not n.is_neg and mag_less_than(x.limbs, n.limbs):
+            return x
+        return x % n
+    return BarrettContext.cached(n).reduce(x)
+
+
+class ModulusContext:
+
+    @classmethod
+    def cached(cls, n):
+        return _cached_context(cls, n.limbs.tobytes())
 
     @staticmethod
-    def ring_pow(x, m, n):
-        if m.value == '0':
-            return BigInt('1')
-        b = dec_to_bin(m.value)
-        z = x % n
-        for i in range(1, len(b)):
-            z = (z * z) % n
-            if b[i] == '1':
-                z = (z * x) % n
+    def for_modulus(n):
+        if len(n.limbs) > 1 and not mag_is_even(n.limbs):
+            return MontgomeryContext.cached(n)
+        if len(n.limbs) >= long_math.BARRETT_CUTOFF:
+            return BarrettContext.cached(n)
+        return RemainderContext.cached(n)
+
+    def pow(self, x, m):
+        z = window_pow(self._enter(x), m.limbs, self._one, self._mul,
+                       self._sqr)
+        return self._leave(z)
+
+    def multi_pow(self, pairs):
+        pairs = [(self._enter(x), m.limbs) for x, m in pairs]
+        z = window_multi_pow(pairs, self._one, self._mul, self._sqr)
+        return self._leave(z)
+
+
+class MontgomeryContext(ModulusContext):
+
+    def __init__(self, n):
+        if n.is_neg or mag_is_even(n.limbs) or n.limbs == array('I', [1]):
+            raise ValueError(f'Montgomery modulus must be odd and > 1: {n}')
+        self.n = n
+        k = len(n.limbs)
+        self.n0inv = -pow(n.limbs[0], -1, BASE) & MASK
+        self.r = mag_divmod(mag_lshift(array('I', [1]), SHIFT * k), n.limbs)[1]
+        self.r2 = mag_divmod(mag_sqr(self.r), n.limbs)[1]
+        self._one = self.r
+
+    def _redc(self, t):
+        return mag_redc(t, self.n.limbs, self.n0inv)
+
+    def _enter(self, x):
+        return self._redc(mag_mul((x % self.n).limbs, self.r2))
+
+    def _leave(self, a):
+        return BigInt._new(self._redc(a))
+
+    def _mul(self, a, b):
+        return self._redc(mag_mul(a, b))
+
+    def _sqr(self, a):
+        return self._redc(mag_sqr(a))
+
+    def to_mont(self, x):
+        return BigInt._new(self._enter(x))
+
+    def from_mont(self, x):
+        return self._leave(x.limbs)
+
+    def mul(self, x, y):
+        return BigInt._new(self._mul(x.limbs, y.limbs))
+
+    def sqr(self, x):
+        return BigInt._new(self._sqr(x.limbs))
+
+
+class RemainderContext(ModulusContext):
+
+    def __init__(self, n):
+        if n.is_neg or not n:
+            raise ValueError(f'modulus must be positive: {n}')
+        self.n = n
+        self._one = self._reduce(array('I', [1]))
+
+    def _reduce(self, a):
+        return mag_divmod(a, self.n.limbs)[1]
+
+    def _enter(self, x):
+        return self.reduce(x).limbs
+
+    def _leave(self, a):
+        return BigInt._new(a)
+
+    def _mul(self, a, b):
+        return self._reduce(mag_mul(a, b))
+
+    def _sqr(self, a):
+        return self._reduce(mag_sqr(a))
+
+    def reduce(self, x):
+        r = BigInt._new(self._reduce(x.limbs))
+        if x.is_neg and r:
+            return self.n - r
+        return r
+
+    def mul(self, x, y):
+        return BigInt._new(self._mul(x.limbs, y.limbs))
+
+    def sqr(self, x):
+        return BigInt._new(self._sqr(x.limbs))
+
+
+class BarrettContext(RemainderContext):
+
+    def __init__(self, n):
+        if n.is_neg or not n:
+            raise ValueError(f'Barrett modulus must be positive: {n}')
+        self.k = len(n.limbs)
+        self.mu = mag_reciprocal(n.limbs)
+        super().__init__(n)
+
+    def _reduce(self, a):
+        k = self.k
+        n = self.n.limbs
+        if len(a) > 2 * k:
+            return mag_divmod(a, n)[1]
+        if mag_less_than(a, n):
+            return array('I', a)
+        q = mag_mul(a[k - 1:], self.mu)[k + 1:]
+        r = mag_sub(a, mag_mul(q, n))
+        while not mag_less_than(r, n):
+            r = mag_sub(r, n)
+        return r
+
+
+class Divisor:
+
+    def __init__(self, d):
+        if not d:
+            raise ZeroDivisionError('division by zero')
+        self.d = d
+        self.mu = None
+
+    def divmod(self, x):
+        # (x / d, x % d): the quotient truncates and the remainder takes the
+        # sign of d, as the BigInt operators do
+        if isinstance(x, int):
+            x = BigInt.from_int(x)
+        d = self.d
+        if len(d.limbs) < long_math.RECIPROCAL_CUTOFF:
+            q, r = mag_divmod(x.limbs, d.limbs)
+        else:
+            if self.mu is None:
+                self.mu = mag_reciprocal(d.limbs)
+            q, r = mag_divmod_reciprocal(x.limbs, d.limbs, self.mu)
+        if r and x.is_neg != d.is_neg:
+            r = mag_sub(d.limbs, r)
+        return BigInt._new(q, x.is_neg != d.is_neg), BigInt._new(r, d.is_neg)
+
+
+class CRTContext:
+
+    def __init__(self, factors):
+        # pairwise coprime p_i; Garner's coefficients
+        # c_i = (p_0 ... p_i-1)**-1 mod p_i
+        self.factors = tuple(factors)
+        if not self.factors:
+            raise ValueError('CRTContext needs at least one prime factor')
+        self.contexts = [ModulusContext.for_modulus(p) for p in self.factors]
+        self.primes = [_is_probable_prime(p) for p in self.factors]
+        self.coefficients = [None]
+        self.n = self.factors[0]
+        for p in self.factors[1:]:
+            c = _cached_inv(self.n % p, p)
+            if c is None:
+                raise ValueError(f'CRT factors are not coprime: {p}')
+            self.coefficients.append(c)
+            self.n = self.n * p
+
+    @classmethod
+    def cached(cls, factors):
+        return _cached_crt(tuple(factors))
+
+    def pow(self, x, m):
+        # the sign of m is ignored, as in ring_pow without factors
+        m = abs(m)
+        if not m:
+            return BigInt.from_int(1)
+        z = prod = None
+        for p, ctx, c, prime in zip(self.factors, self.contexts,
+                                    self.coefficients, self.primes):
+            # for a prime p, x**m == x**((m - 1) % (p - 1) + 1) mod p, also
+            # when p divides x
+            r = ctx.pow(x % p, (m - 1) % (p - 1) + 1 if prime else m)
+            if z is None:
+                z, prod = r, p
+                continue
+            z = z + BigInt.ring_mul(r - z, c, p) * prod
+            prod = prod * p
         return z
 
 
+class FixedBasePow:
+
+    def __init__(self, g, n):
+        self.g = g
+        self.n = n
+        self.ctx = ModulusContext.for_modulus(n)
+        self.k = window_size(len(mag_to_bin(n.limbs)))
+        self.powers = [self.ctx._enter(g)]
+
+    def pow(self, m):
+        # Yao's method over base 2**k digits of m, with g**(2**(k*i)) cached
+        if backend.current.powmod is not None:
+            return _powmod(self.g, m, self.n)
+        ctx = self.ctx
+        bits = mag_to_bin(m.limbs)
+        k = self.k
+        buckets = {}
+        for i, end in enumerate(range(len(bits), 0, -k)):
+            d = int(bits[max(0, end - k):end], 2)
+            if d:
+                buckets.setdefault(d, []).append(i)
+        if not buckets:
+            return ctx._leave(ctx._one)
+        while len(self.powers) <= i:
+            p = self.powers[-1]
+            for _ in range(k):
+                p = ctx._sqr(p)
+            self.powers.append(p)
+        z = u = None
+        for d in range((1 << k) - 1, 0, -1):
+            for i in buckets.get(d, ()):
+                p = self.powers[i]
+                u = p if u is None else ctx._mul(u, p)
+            if u is not None:
+                z = u if z is None else ctx._mul(z, u)
+        return ctx._leave(z)
+
+
 if __name__ == '__main__':
+    if sys.argv[1:2] == ['tune']:
+        import tuning
+        sys.exit(tuning.main(sys.argv[2:]))
+
     menu_text = '\n'.join([
         'Выберите операцию:',
         '1) x + y',
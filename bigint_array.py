@@ -0,0 +1,211 @@
+import operator
+from array import array
+
+from bigint import BarrettContext, BigInt
+from long_math import BASE, MASK, SHIFT, mag_normalize, mag_to_bin
+
+try:
+    import numpy as np
+except ImportError:
+    np = None
+
+
+def _row(limbs):
+    row = np.frombuffer(limbs.tobytes(), dtype=np.uint32).astype(np.uint64)
+    return (row if row.size else np.zeros(1, dtype=np.uint64))[None, :]
+
+
+def _pad(m, width):
+    if m.shape[1] >= width:
+        return m.copy()
+    r = np.zeros((m.shape[0], width), dtype=m.dtype)
+    r[:, :m.shape[1]] = m
+    return r
+
+
+def _trim(m):
+    nz = np.flatnonzero(m.any(axis=0))
+    return m[:, :nz[-1] + 1 if nz.size else 1]
+
+
+def _carry(m, shift, mask):
+    shift, mask = np.uint64(shift), np.uint64(mask)
+    for j in range(m.shape[1] - 1):
+        m[:, j + 1] += m[:, j] >> shift
+        m[:, j] &= mask
+    return m
+
+
+def _add(a, b):
+    r = _pad(a, max(a.shape[1], b.shape[1]) + 1)
+    if r.shape[0] < b.shape[0]:
+        r = np.repeat(r, b.shape[0], axis=0)
+    r[:, :b.shape[1]] += b
+    return _trim(_carry(r, SHIFT, MASK))
+
+
+def _sub(a, b):
+    # returns a - b and the rows where the subtraction borrowed
+    r = _pad(a, max(a.shape[1], b.shape[1])).astype(np.int64)
+    if r.shape[0] < b.shape[0]:
+        r = np.repeat(r, b.shape[0], axis=0)
+    r[:, :b.shape[1]] -= b.astype(np.int64)
+    for j in range(r.shape[1] - 1):
+        neg = r[:, j] < 0
+        r[:, j] += neg * BASE
+        r[:, j + 1] -= neg
+    borrow = r[:, -1] < 0
+    r[:, -1] += borrow * BASE
+    return r.astype(np.uint64), borrow
+
+
+def _split16(m):
+    h = np.empty((m.shape[0], 2 * m.shape[1]), dtype=np.uint64)
+    h[:, 0::2] = m & np.uint64(0xFFFF)
+    h[:, 1::2] = m >> np.uint64(16)
+    return h
+
+
+def _mul(a, b):
+    # 16-bit sublimbs keep every column sum of products inside uint64
+    a16, b16 = _split16(a), _split16(b)
+    rows = max(a.shape[0], b.shape[0])
+    acc = np.zeros((rows, a16.shape[1] + b16.shape[1]), dtype=np.uint64)
+    for i in range(a16.shape[1]):
+        acc[:, i:i + b16.shape[1]] += a16[:, i:i + 1] * b16
+    _carry(acc, 16, 0xFFFF)
+    return _trim(acc[:, 0::2] | (acc[:, 1::2] << np.uint64(16)))
+
+
+def _select(mask, a, b):
+    width = max(a.shape[1], b.shape[1])
+    return np.where(mask[:, None], _pad(a, width), _pad(b, width))
+
+
+class _Modulus:
+
+    def __init__(self, n):
+        ctx = BarrettContext.cached(n)
+        self.k = ctx.k
+        self.n = _row(n.limbs)
+        self.mu = _row(ctx.mu)
+
+    def _barrett(self, x):
+        # x < BASE**(2k)
+        k = self.k
+        if x.shape[1] < k:
+            q = np.zeros((x.shape[0], 1), dtype=np.uint64)
+        else:
+            q = _mul(x[:, k - 1:], self.mu)[:, k + 1:]
+        if not q.shape[1]:
+            q = np.zeros((x.shape[0], 1), dtype=np.uint64)
+        r = _sub(x, _mul(q, self.n))[0]
+        for _ in range(2):
+            d, borrow = _sub(r, self.n)
+            r = _select(borrow, r, d)
+        return _trim(r)
+
+    def reduce(self, x):
+        k = self.k
+        if x.shape[1] <= 2 * k:
+            return self._barrett(x)
+        start = (x.shape[1] - 1) // k * k
+        r = self._barrett(x[:, start:])
+        for start in range(start - k, -1, -k):
+            r = self._barrett(np.hstack([x[:, start:start + k], r]))
+        return r
+
+
+class BigIntArray:
+
+    def __init__(self, values=()):
+        if np is None:
+            raise ImportError('BigIntArray requires numpy')
+        rows = []
+        for value in values:
+            if isinstance(value, str):
+                value = BigInt(value)
+            if value.is_neg:
+                raise ValueError(f'negative value in BigIntArray: {value}')
+            rows.append(value.limbs)
+        width = max((len(limbs) for limbs in rows), default=1) or 1
+        self.limbs = np.zeros((len(rows), width), dtype=np.uint64)
+        for i, limbs in enumerate(rows):
+            row = np.frombuffer(limbs.tobytes(), dtype=np.uint32)
+            self.limbs[i, :len(limbs)] = row
+
+    @classmethod
+    def _wrap(cls, m):
+        self = object.__new__(cls)
+        self.limbs = m
+        return self
+
+    def __len__(self):
+        return self.limbs.shape[0]
+
+    def __getitem__(self, i):
+        if isinstance(i, slice):
+            return BigIntArray._wrap(_trim(self.limbs[i]).copy())
+        row = self.limbs[operator.index(i)].astype(np.uint32)
+        return BigInt._new(mag_normalize(array('I', row.tobytes())))
+
+    def __iter__(self):
+        for i in range(len(self)):
+            yield self[i]
+
+    def __repr__(self):
+        return f'BigIntArray([{", ".join(map(str, self))}])'
+
+    @staticmethod
+    def _operand(other):
+        if isinstance(other, BigIntArray):
+            return other.limbs
+        if other.is_neg:
+            raise ValueError(f'negative operand for BigIntArray: {other}')
+        return _row(other.limbs)
+
+    def __add__(self, other):
+        return BigIntArray._wrap(_add(self.limbs, self._operand(other)))
+
+    def __sub__(self, other):
+        r, borrow = _sub(self.limbs, self._operand(other))
+        if borrow.any():
+            raise ValueError('BigIntArray subtraction result is negative')
+        return BigIntArray._wrap(_trim(r))
+
+    def __mul__(self, other):
+        return BigIntArray._wrap(_mul(self.limbs, self._operand(other)))
+
+    def __mod__(self, n):
+        return BigIntArray._wrap(_Modulus(n).reduce(self.limbs))
+
+    def ring_add(self, other, n):
+        mod = _Modulus(n)
+        z = _add(mod.reduce(self.limbs), mod.reduce(self._operand(other)))
+        d, borrow = _sub(z, mod.n)
+        return BigIntArray._wrap(_trim(_select(borrow, z, d)))
+
+    def ring_sub(self, other, n):
+        mod = _Modulus(n)
+        width = mod.n.shape[1]
+        x = _pad(mod.reduce(self.limbs), width)
+        z, borrow = _sub(x, mod.reduce(self._operand(other)))
+        wrapped = _add(z, mod.n)[:, :width]
+        return BigIntArray._wrap(_trim(_select(borrow, wrapped, z)))
+
+    def ring_mul(self, other, n):
+        mod = _Modulus(n)
+        z = _mul(mod.reduce(self.limbs), mod.reduce(self._operand(other)))
+        return BigIntArray._wrap(mod.reduce(z))
+
+    def ring_pow(self, m, n):
+        mod = _Modulus(n)
+        x = mod.reduce(self.limbs)
+        z = mod.reduce(np.ones((len(self), 1), dtype=np.uint64))
+        if not m:
+            return BigIntArray._wrap(z)
+        for bit in mag_to_bin(m.limbs):
+            z = mod.reduce(_mul(z, z))
+            if bit == '1':
+                z = mod.reduce(_mul(z, x))
+        return BigIntArray._wrap(z)
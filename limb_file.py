@@ -0,0 +1,153 @@
+import mmap
+import os
+from array import array
+
+import backend
+from bigint import BigInt
+from long_math import (BASE, mag_cmp, mag_from_bytes, mag_less_than,
+                       mag_normalize, mag_to_bytes)
+
+CHUNK_LIMBS = 1 << 16
+
+
+class LimbFile:
+    # a non-negative integer stored as little-endian 32-bit limbs
+
+    def __init__(self, path):
+        self.path = path
+        self._file = open(path, 'rb')
+        size = os.fstat(self._file.fileno()).st_size // 4
+        self._map = None
+        if size:
+            self._map = mmap.mmap(self._file.fileno(), 0,
+                                  access=mmap.ACCESS_READ)
+        while size and not self.limbs(size - 1, size)[0]:
+            size -= 1
+        self.size = size
+
+    @staticmethod
+    def write(path, x):
+        if x.is_neg:
+            raise ValueError(f'negative value for LimbFile: {x}')
+        with open(path, 'wb') as f:
+            f.write(mag_to_bytes(x.limbs))
+
+    def to_bigint(self):
+        return BigInt._new(mag_normalize(self.limbs(0, self.size)))
+
+    def limbs(self, start, stop):
+        # limbs [start, stop), zero-padded past the end of the file
+        a = array('I')
+        if self._map:
+            a = mag_from_bytes(self._map[4 * start:4 * stop])
+        return a + array('I', [0]) * (stop - start - len(a))
+
+    def chunks(self, size):
+        for start in range(0, size, CHUNK_LIMBS):
+            yield self.limbs(start, min(start + CHUNK_LIMBS, size))
+
+    def __len__(self):
+        return self.size
+
+    def close(self):
+        if self._map:
+            self._map.close()
+        self._file.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *args):
+        self.close()
+
+
+class _Writer:
+
+    def __init__(self, path):
+        self._file = open(path, 'wb')
+        self.size = 0
+        self._top = 0
+
+    def write(self, a):
+        self._file.write(mag_to_bytes(a))
+        n = len(mag_normalize(array('I', a)))
+        if n:
+            self._top = self.size + n
+        self.size += len(a)
+
+    def close(self):
+        self._file.truncate(4 * self._top)
+        self._file.close()
+        return self._top
+
+
+def _split(r, size):
+    # low size limbs of r, zero-padded, and the rest as the carry
+    low = r[:size]
+    return low + array('I', [0]) * (size - len(low)), r[size:]
+
+
+def file_add(a, b, out):
+    with LimbFile(a) as x, LimbFile(b) as y:
+        size = max(len(x), len(y))
+        w = _Writer(out)
+        carry = array('I')
+        for ca, cb in zip(x.chunks(size), y.chunks(size)):
+            r = backend.current.add(backend.current.add(ca, cb), carry)
+            low, carry = _split(r, len(ca))
+            w.write(low)
+        w.write(carry)
+        return w.close()
+
+
+def file_sub(a, b, out):
+    # a - b for a >= b
+    with LimbFile(a) as x, LimbFile(b) as y:
+        if _cmp(x, y) < 0:
+            raise ValueError('file_sub() result is negative')
+        w = _Writer(out)
+        borrow = array('I')
+        for ca, cb in zip(x.chunks(len(x)), y.chunks(len(x))):
+            t = mag_normalize(backend.current.add(cb, borrow))
+            ca = mag_normalize(ca)
+            size = len(cb)
+            if mag_less_than(ca, t):
+                wrap = array('I', [0]) * size + array('I', [1])
+                r = backend.current.sub(backend.current.add(ca, wrap), t)
+                borrow = array('I', [1])
+            else:
+                r = backend.current.sub(ca, t)
+                borrow = array('I')
+            w.write(_split(r, size)[0])
+        return w.close()
+
+
+def file_mul_small(a, m, out):
+    if not 0 <= m < BASE:
+        raise ValueError(f'multiplier must fit in one limb: {m}')
+    with LimbFile(a) as x:
+        w = _Writer(out)
+        carry = array('I')
+        for ca in x.chunks(len(x)):
+            r = backend.current.mul(ca, array('I', [m] if m else []))
+            r = backend.current.add(r, carry)
+            low, carry = _split(r, len(ca))
+            w.write(low)
+        w.write(carry)
+        return w.close()
+
+
+def _cmp(x, y):
+    if len(x) != len(y):
+        return -1 if len(x) < len(y) else 1
+    for stop in range(len(x), 0, -CHUNK_LIMBS):
+        start = max(stop - CHUNK_LIMBS, 0)
+        c = mag_cmp(x.limbs(start, stop), y.limbs(start, stop))
+        if c:
+            return c
+    return 0
+
+
+def file_cmp(a, b):
+    with LimbFile(a) as x, LimbFile(b) as y:
+        return _cmp(x, y)
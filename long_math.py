@@ -1,35 +1,82 @@
+import json
+import math
+import os
+import sys
+from array import array
 from typing import Tuple
 
+SHIFT = 32
+BASE = 1 << SHIFT
+MASK = BASE - 1
+DEC_SHIFT = 9
+DEC_BASE = 10 ** DEC_SHIFT
 
-def dec_to_bin(s1: str) -> str:
-    return bin(int(s1))[2:]
+KARATSUBA_CUTOFF = 48
+TOOM3_CUTOFF = 160
+KARATSUBA_SQR_CUTOFF = 64
+TOOM3_SQR_CUTOFF = 200
+BURNIKEL_ZIEGLER_CUTOFF = 80
+DEC_CONVERSION_CUTOFF = 40
+HGCD_CUTOFF = 100
+RECIPROCAL_CUTOFF = 1200
+# Barrett reduction measured no faster than mag_divmod up to 2048 limbs, so
+# it stays off unless tuning finds otherwise
+BARRETT_CUTOFF = sys.maxsize
 
+# cutoffs that `python -m bigint tune` measures and saves for this machine
+TUNABLE_CUTOFFS = (
+    'KARATSUBA_CUTOFF', 'TOOM3_CUTOFF',
+    'KARATSUBA_SQR_CUTOFF', 'TOOM3_SQR_CUTOFF',
+    'BURNIKEL_ZIEGLER_CUTOFF', 'DEC_CONVERSION_CUTOFF', 'HGCD_CUTOFF',
+    'RECIPROCAL_CUTOFF', 'BARRETT_CUTOFF',
+)
 
-def less_than(s1: str, s2: str) -> bool:
-    s1 = s1.lstrip('0') or '0'
-    s2 = s2.lstrip('0') or '0'
 
-    l1 = len(s1)
-    l2 = len(s2)
+def thresholds_path() -> str:
+    path = os.environ.get('BIGINT_THRESHOLDS')
+    if path:
+        return path
+    cache = os.environ.get('XDG_CACHE_HOME')
+    if not cache:
+        cache = os.path.join(os.path.expanduser('~'), '.cache')
+    return os.path.join(cache, 'bigint', 'thresholds.json')
 
-    if l1 < l2:
-        return True
-    elif l2 < l1:
-        return False
 
-    for x, y in zip(s1, s2):
-        if x < y:
-            return True
-        elif x > y:
-            return False
+def load_thresholds(path: str = None) -> dict:
+    # a missing or unreadable file keeps the defaults
+    try:
+        with open(path or thresholds_path()) as f:
+            saved = json.load(f)['thresholds']
+        values = {name: value for name, value in saved.items()
+                  if name in TUNABLE_CUTOFFS
+                  and type(value) is int and value >= 2}
+    except (OSError, ValueError, KeyError, TypeError, AttributeError):
+        return {}
+    globals().update(values)
+    return values
 
-    return False
+
+load_thresholds()
+
+
+def dec_to_bin(s1: str) -> str:
+    return mag_to_bin(from_dec(str(s1)))
+
+
+def l_cmp(s1: str, s2: str) -> int:
+    s1 = s1.lstrip('0')
+    s2 = s2.lstrip('0')
+    if len(s1) != len(s2):
+        return -1 if len(s1) < len(s2) else 1
+    return (s1 > s2) - (s1 < s2)
+
+
+def less_than(s1: str, s2: str) -> bool:
+    return l_cmp(s1, s2) < 0
 
 
 def is_equal(s1: str, s2: str) -> bool:
-    s1 = s1.lstrip('0') or '0'
-    s2 = s2.lstrip('0') or '0'
-    return s1 == s2
+    return l_cmp(s1, s2) == 0
 
 
 def is_even(s1: str) -> bool:
@@ -46,7 +93,7 @@ def l_add(s1: str, s2: str) -> str:
     s2 = s2.zfill(n)
     w = 0
     base = 10 ** 9
-    s3 = ''
+    parts = []
     for i in range(1, k + 1):
         start = n - 9
         a = int(s1[start:n])
@@ -60,11 +107,11 @@ def l_add(s1: str, s2: str) -> str:
             w = 1
         s = str(z)
         s = s.zfill(9)
-        s3 = s + s3
+        parts.append(s)
         n -= 9
     if w == 1:
-        s3 = '1' + s3
-    s3 = s3.lstrip('0')
+        parts.append('1')
+    s3 = ''.join(reversed(parts)).lstrip('0')
     return s3 or '0'
 
 
@@ -78,7 +125,7 @@ def l_sub(s1: str, s2: str) -> str:
     s2 = s2.zfill(n)
     w = 0
     base = 10 ** 9
-    s3 = ''
+    parts = []
     for i in range(1, k + 1):
         start = n - 9
         a = int(s1[start:n])
@@ -92,106 +139,933 @@ def l_sub(s1: str, s2: str) -> str:
             w = 1
         s = str(z)
         s = s.zfill(9)
-        s3 = s + s3
+        parts.append(s)
         n -= 9
-    s3 = s3.lstrip('0')
+    s3 = ''.join(reversed(parts)).lstrip('0')
     return s3 or '0'
 
 
 def l_mul(s1: str, s2: str) -> str:
-    l1 = len(s1)
-    l2 = len(s2)
-    m = max(l1, l2)
-    k = int((m - 1) / 4 + 1)
-    n = 4 * k
-    s1 = s1.zfill(n)
-    s2 = s2.zfill(n)
-    base = 10 ** 4
-    st = '0'
-    n1 = n
-    for j in range(1, k + 1):
-        b = int(s2[n1-4:n1])
-        n2 = n
-        w = 0
-        s3 = ''
-        for i in range(1, k + 1):
-            a = int(s1[n2-4:n2])
-            c = a * b + w
-            if c < base:
-                z = c
-                w = 0
-            else:
-                z = c % base
-                w = int(c / base)
-            s = str(z)
-            s = s.zfill(4)
-            s3 = s + s3
-            n2 -= 4
-        if w != 0:
-            s3 = str(w) + s3
-        s3 += '0' * (4 * (j - 1))
-        st = l_add(st, s3)
-        n1 -= 4
-    st = st.lstrip('0') or '0'
-    return st
+    return to_dec(mag_mul(from_dec(s1), from_dec(s2)))
+
+
+def l_sqr(s1: str) -> str:
+    return to_dec(mag_sqr(from_dec(s1)))
 
 
 def l_divmod(s1: str, s2: str) -> Tuple[str, str]:
-    l1 = len(s1)
-    l2 = len(s2)
-    s3 = ''
-    index = l2
-    curr_div = s1[:index]
-    if less_than(curr_div, s2):
-        index += 1
-        curr_div = s1[:index]
-    old_div = curr_div
-    while less_than(s2, curr_div) or is_equal(s2, curr_div):
-        i = 0
-        while less_than(s2, curr_div) or is_equal(s2, curr_div):
-            curr_div = l_sub(curr_div, s2)
-            i += 1
-        s3 += str(i)
-        old_div = curr_div
-        if len(s2) == len(old_div):
-            curr_div += s1[index: index + 1]
-            index += 1
-        else:
-            curr_div += s1[index: index + l2 - len(old_div)]
-            index += l2 - len(old_div)
-        s3 += '0' * (len(curr_div) - len(old_div) - 1)
-        if less_than(curr_div, s2) and index < l1:
-            curr_div += s1[index:index + 1]
-            index += 1
-            s3 += '0'
-    if len(old_div) < len(curr_div):
-        s3 += '0'
-    curr_div = curr_div.lstrip('0')
-    return s3 or '0', curr_div or '0'
+    q, r = mag_divmod(from_dec(s1), from_dec(s2))
+    return to_dec(q), to_dec(r)
 
 
 def l_pow(s1: str, s2: str):
-    if s2 == '0':
-        return '1'
-    b = dec_to_bin(s2)
-    z = s1
-    for i in range(1, len(b)):
-        z = l_mul(z, z)
-        if b[i] == '1':
-            z = l_mul(z, s1)
-    return z
+    return to_dec(mag_pow(from_dec(s1), from_dec(s2)))
 
 
 def l_root(s1: str, s2: str):
-    if s1 == '0':
-        return s1
-    if s2 == '1':
-        return s1
-    s2_1 = l_sub(s2, '1')
-    x = s1
+    return to_dec(mag_root(from_dec(s1), int(s2)))
+
+
+def mag_normalize(a: array) -> array:
+    n = len(a)
+    while n and not a[n - 1]:
+        n -= 1
+    del a[n:]
+    return a
+
+
+def mag_from_bytes(data) -> array:
+    # little-endian 32-bit limbs
+    a = array('I')
+    a.frombytes(data)
+    if sys.byteorder == 'big':
+        a.byteswap()
+    return a
+
+
+def mag_to_bytes(a: array) -> bytes:
+    if sys.byteorder == 'big':
+        a = array('I', a)
+        a.byteswap()
+    return a.tobytes()
+
+
+def mag_from_int(x: int) -> array:
+    if x < BASE:
+        return array('I', [x] if x else [])
+    size = 4 * -(-x.bit_length() // SHIFT)
+    return mag_from_bytes(x.to_bytes(size, 'little'))
+
+
+def mag_to_int(a: array) -> int:
+    return int.from_bytes(mag_to_bytes(a), 'little')
+
+
+def mag_is_even(a: array) -> bool:
+    return not a or not a[0] & 1
+
+
+def mag_to_bin(a: array) -> str:
+    if not a:
+        return '0'
+    low = ''.join(format(x, '032b') for x in reversed(a[:-1]))
+    return bin(a[-1])[2:] + low
+
+
+def mag_cmp(a: array, b: array) -> int:
+    if len(a) != len(b):
+        return -1 if len(a) < len(b) else 1
+    if a == b:
+        return 0
+    i = len(a) - 1
+    while a[i] == b[i]:
+        i -= 1
+    return -1 if a[i] < b[i] else 1
+
+
+def mag_less_than(a: array, b: array) -> bool:
+    return mag_cmp(a, b) < 0
+
+
+def mag_add(a: array, b: array) -> array:
+    if len(a) < len(b):
+        a, b = b, a
+    return mag_iadd(array('I', a), b)
+
+
+def mag_iadd(a: array, b: array) -> array:
+    if len(a) < len(b):
+        a.extend(array('I', [0]) * (len(b) - len(a)))
+    w = 0
+    for i, y in enumerate(b):
+        c = a[i] + y + w
+        a[i] = c & MASK
+        w = c >> SHIFT
+    i = len(b)
+    while w and i < len(a):
+        c = a[i] + w
+        a[i] = c & MASK
+        w = c >> SHIFT
+        i += 1
+    if w:
+        a.append(w)
+    return a
+
+
+def mag_sub(a: array, b: array) -> array:
+    # a >= b
+    return mag_isub(array('I', a), b)
+
+
+def mag_isub(a: array, b: array) -> array:
+    # a >= b
+    w = 0
+    for i, y in enumerate(b):
+        c = a[i] - y - w
+        a[i] = c & MASK
+        w = c < 0
+    i = len(b)
+    while w:
+        c = a[i] - 1
+        a[i] = c & MASK
+        w = c < 0
+        i += 1
+    return mag_normalize(a)
+
+
+def _mul_school(a, b) -> array:
+    r = [0] * (len(a) + len(b))
+    for i, x in enumerate(a):
+        if not x:
+            continue
+        w = 0
+        k = i
+        for y in b:
+            c = r[k] + x * y + w
+            r[k] = c & MASK
+            w = c >> SHIFT
+            k += 1
+        r[k] = w
+    return mag_normalize(array('I', r))
+
+
+def _add_at(r: list, a, k: int) -> None:
+    w = 0
+    for x in a:
+        c = r[k] + x + w
+        r[k] = c & MASK
+        w = c >> SHIFT
+        k += 1
+    while w:
+        c = r[k] + w
+        r[k] = c & MASK
+        w = c >> SHIFT
+        k += 1
+
+
+def _mul_unbalanced(a, b) -> array:
+    r = [0] * (len(a) + len(b))
+    n = len(b)
+    for i in range(0, len(a), n):
+        _add_at(r, mag_mul(mag_normalize(a[i:i + n]), b), i)
+    return mag_normalize(array('I', r))
+
+
+def _mul_karatsuba(a, b) -> array:
+    n = (len(a) + 1) // 2
+    a0, a1 = mag_normalize(a[:n]), a[n:]
+    b0, b1 = mag_normalize(b[:n]), b[n:]
+    z0 = mag_mul(a0, b0)
+    z2 = mag_mul(a1, b1)
+    z1 = mag_sub(mag_sub(mag_mul(mag_add(a0, a1), mag_add(b0, b1)), z0), z2)
+    r = [0] * (len(a) + len(b) + 1)
+    _add_at(r, z0, 0)
+    _add_at(r, z1, n)
+    _add_at(r, z2, 2 * n)
+    return mag_normalize(array('I', r))
+
+
+def _s_add(x, y):
+    # signed (is_neg, limbs) pairs
+    if x[0] == y[0]:
+        return x[0], mag_add(x[1], y[1])
+    if mag_less_than(x[1], y[1]):
+        return y[0], mag_sub(y[1], x[1])
+    return x[0], mag_sub(x[1], y[1])
+
+
+def _s_sub(x, y):
+    return _s_add(x, (not y[0], y[1]))
+
+
+def _s_mul(x, y):
+    return x[0] != y[0], mag_mul(x[1], y[1])
+
+
+def _s_div_small(x, d):
+    return x[0], mag_divmod_small(x[1], d)[0]
+
+
+def _toom3_points(a, k):
+    m0, m1, m2 = (mag_normalize(a[i * k:(i + 1) * k]) for i in range(3))
+    p0 = (False, mag_add(m0, m2))
+    p1 = _s_add(p0, (False, m1))
+    pm1 = _s_sub(p0, (False, m1))
+    pm2 = _s_add(pm1, (False, m2))
+    pm2 = _s_sub(_s_add(pm2, pm2), (False, m0))
+    return (False, m0), p1, pm1, pm2, (False, m2)
+
+
+def _mul_toom3(a, b) -> array:
+    k = (len(a) + 2) // 3
+    pa = _toom3_points(a, k)
+    if a is b:
+        r0, r1, rm1, rm2, r4 = ((False, mag_sqr(p[1])) for p in pa)
+    else:
+        pb = _toom3_points(b, k)
+        r0, r1, rm1, rm2, r4 = (_s_mul(p, q) for p, q in zip(pa, pb))
+    # Bodrato's interpolation sequence
+    r3 = _s_div_small(_s_sub(rm2, r1), 3)
+    r1 = _s_div_small(_s_sub(r1, rm1), 2)
+    r2 = _s_sub(rm1, r0)
+    r3 = _s_add(_s_div_small(_s_sub(r2, r3), 2), _s_add(r4, r4))
+    r2 = _s_sub(_s_add(r2, r1), r4)
+    r1 = _s_sub(r1, r3)
+    r = [0] * (len(a) + len(b) + 1)
+    for i, z in enumerate((r0, r1, r2, r3, r4)):
+        _add_at(r, z[1], i * k)
+    return mag_normalize(array('I', r))
+
+
+def _sqr_school(a) -> array:
+    n = len(a)
+    r = [0] * (2 * n)
+    for i in range(n):
+        x = a[i]
+        if not x:
+            continue
+        w = 0
+        k = 2 * i + 1
+        for j in range(i + 1, n):
+            c = r[k] + x * a[j] + w
+            r[k] = c & MASK
+            w = c >> SHIFT
+            k += 1
+        r[k] = w
+    w = 0
+    for i, x in enumerate(a):
+        c = (r[2 * i] << 1) + x * x + w
+        r[2 * i] = c & MASK
+        c = (r[2 * i + 1] << 1) + (c >> SHIFT)
+        r[2 * i + 1] = c & MASK
+        w = c >> SHIFT
+    return mag_normalize(array('I', r))
+
+
+def _sqr_karatsuba(a) -> array:
+    n = (len(a) + 1) // 2
+    a0, a1 = mag_normalize(a[:n]), a[n:]
+    z0 = mag_sqr(a0)
+    z2 = mag_sqr(a1)
+    z1 = mag_sub(mag_sub(mag_sqr(mag_add(a0, a1)), z0), z2)
+    r = [0] * (2 * len(a) + 1)
+    _add_at(r, z0, 0)
+    _add_at(r, z1, n)
+    _add_at(r, z2, 2 * n)
+    return mag_normalize(array('I', r))
+
+
+def mag_sqr(a: array) -> array:
+    if len(a) < KARATSUBA_SQR_CUTOFF:
+        return _sqr_school(a)
+    if len(a) < TOOM3_SQR_CUTOFF:
+        return _sqr_karatsuba(a)
+    return _mul_toom3(a, a)
+
+
+def mag_mul(a: array, b: array) -> array:
+    if a is b:
+        return mag_sqr(a)
+    if len(a) < len(b):
+        a, b = b, a
+    if not b:
+        return array('I')
+    if len(b) == 1:
+        return mag_mul_small(a, b[0])
+    if len(b) < KARATSUBA_CUTOFF:
+        return _mul_school(a, b)
+    if 2 * len(b) <= len(a):
+        return _mul_unbalanced(a, b)
+    if len(b) < TOOM3_CUTOFF:
+        return _mul_karatsuba(a, b)
+    return _mul_toom3(a, b)
+
+
+def mag_mul_small(a: array, m: int, w: int = 0) -> array:
+    return mag_imul_small(array('I', a), m, w)
+
+
+def mag_imul_small(a: array, m: int, w: int = 0) -> array:
+    for i, x in enumerate(a):
+        c = x * m + w
+        a[i] = c & MASK
+        w = c >> SHIFT
+    if w:
+        a.append(w)
+    return mag_normalize(a)
+
+
+def mag_divmod_small(a: array, d: int) -> Tuple[array, int]:
+    q = array('I', a)
+    w = 0
+    for i in range(len(a) - 1, -1, -1):
+        q[i], w = divmod((w << SHIFT) | a[i], d)
+    return mag_normalize(q), w
+
+
+def mag_lshift(a: array, n: int) -> array:
+    if not a:
+        return array('I')
+    k, s = divmod(n, SHIFT)
+    r = array('I', [0]) * k
+    if not s:
+        return r + a
+    w = 0
+    for x in a:
+        c = (x << s) | w
+        r.append(c & MASK)
+        w = c >> SHIFT
+    if w:
+        r.append(w)
+    return r
+
+
+def mag_rshift(a: array, n: int) -> array:
+    return mag_irshift(a[n // SHIFT:], n % SHIFT)
+
+
+def mag_irshift(a: array, n: int) -> array:
+    k, s = divmod(n, SHIFT)
+    del a[:k]
+    if not s:
+        return a
+    w = 0
+    for i in range(len(a) - 1, -1, -1):
+        x = a[i]
+        a[i] = (x >> s) | w
+        w = (x << (SHIFT - s)) & MASK
+    return mag_normalize(a)
+
+
+def mag_and(a: array, b: array) -> array:
+    return mag_normalize(array('I', (x & y for x, y in zip(a, b))))
+
+
+def mag_or(a: array, b: array) -> array:
+    if len(a) < len(b):
+        a, b = b, a
+    r = array('I', a)
+    for i, y in enumerate(b):
+        r[i] |= y
+    return r
+
+
+def mag_trailing_zeros(a: array) -> int:
+    for i, x in enumerate(a):
+        if x:
+            return SHIFT * i + (x & -x).bit_length() - 1
+    return 0
+
+
+def _divmod_knuth(a, b) -> Tuple[array, array]:
+    # Knuth, TAOCP vol. 2, 4.3.1, Algorithm D
+    s = SHIFT - b[-1].bit_length()
+    v = list(mag_lshift(b, s))
+    u = list(mag_lshift(a, s))
+    u.append(0)
+    n = len(v)
+    m = len(u) - n
+    vtop, vsec = v[-1], v[-2]
+    q = array('I', [0]) * m
+    for j in range(m - 1, -1, -1):
+        qhat, rhat = divmod((u[j + n] << SHIFT) | u[j + n - 1], vtop)
+        while rhat < BASE and (
+                qhat >= BASE
+                or qhat * vsec > ((rhat << SHIFT) | u[j + n - 2])):
+            qhat -= 1
+            rhat += vtop
+        if not qhat:
+            continue
+        c = 0
+        k = j
+        for x in v:
+            c += u[k] - qhat * x
+            u[k] = c & MASK
+            c >>= SHIFT
+            k += 1
+        c += u[k]
+        u[k] = c & MASK
+        if c < 0:
+            qhat -= 1
+            c = 0
+            k = j
+            for x in v:
+                c += u[k] + x
+                u[k] = c & MASK
+                c >>= SHIFT
+                k += 1
+            u[k] = (u[k] + c) & MASK
+        q[j] = qhat
+    r = mag_rshift(mag_normalize(array('I', u[:n])), s)
+    return mag_normalize(q), r
+
+
+def _divmod_basic(a, b) -> Tuple[array, array]:
+    if mag_less_than(a, b):
+        return array('I'), array('I', a)
+    if len(b) == 1:
+        q, r = mag_divmod_small(a, b[0])
+        return q, mag_normalize(array('I', [r]))
+    return _divmod_knuth(a, b)
+
+
+def _join(hi, lo, n: int) -> array:
+    # hi * BASE**n + lo, where len(lo) <= n
+    if not hi:
+        return array('I', lo)
+    return lo + array('I', [0]) * (n - len(lo)) + hi
+
+
+def _div2n1n(a, b, n: int) -> Tuple[array, array]:
+    # a < b * BASE**n, b has n limbs and its top bit set
+    if len(a) - n <= BURNIKEL_ZIEGLER_CUTOFF:
+        return _divmod_basic(a, b)
+    pad = n & 1
+    if pad:
+        a = _join(a, array('I'), 1)
+        b = _join(b, array('I'), 1)
+        n += 1
+    h = n >> 1
+    b1, b2 = b[h:], mag_normalize(b[:h])
+    q1, r = _div3n2n(a[n:], mag_normalize(a[h:n]), b, b1, b2, h)
+    q2, r = _div3n2n(r, mag_normalize(a[:h]), b, b1, b2, h)
+    if pad:
+        r = r[1:]
+    return _join(q1, q2, h), r
+
+
+def _div3n2n(a12, a3, b, b1, b2, n: int) -> Tuple[array, array]:
+    if a12[n:] == b1:
+        q = array('I', [MASK]) * n
+        r = mag_add(mag_normalize(a12[:n]), b1)
+    else:
+        q, r = _div2n1n(a12, b1, n)
+    t = _join(r, a3, n)
+    p = mag_mul(q, b2)
+    while mag_less_than(t, p):
+        q = mag_sub(q, array('I', [1]))
+        t = mag_add(t, b)
+    return q, mag_sub(t, p)
+
+
+def _divmod_bz(a, b) -> Tuple[array, array]:
+    # Burnikel, Ziegler, "Fast Recursive Division", 1998
+    s = SHIFT - b[-1].bit_length()
+    b = mag_lshift(b, s)
+    a = mag_lshift(a, s)
+    n = len(b)
+    digits = [mag_normalize(a[i:i + n]) for i in range(0, len(a), n)]
+    q = array('I')
+    r = array('I')
+    while digits:
+        qd, r = _div2n1n(_join(r, digits.pop(), n), b, n)
+        q = _join(q, qd, n)
+    return mag_normalize(q), mag_rshift(r, s)
+
+
+def mag_divmod(a: array, b: array) -> Tuple[array, array]:
+    n = BURNIKEL_ZIEGLER_CUTOFF
+    if len(b) < n or len(a) - len(b) < n:
+        return _divmod_basic(a, b)
+    return _divmod_bz(a, b)
+
+
+def mag_reciprocal(d: array) -> array:
+    # floor(BASE**(2k) / d) for k = len(d)
+    return mag_divmod(array('I', [0]) * (2 * len(d)) + array('I', [1]), d)[0]
+
+
+def _divmod_barrett(a, d, mu) -> Tuple[array, array]:
+    # a < BASE**(2k), mu = mag_reciprocal(d)
+    k = len(d)
+    q = mag_mul(a[k - 1:], mu)[k + 1:]
+    r = mag_sub(a, mag_mul(q, d))
+    while not mag_less_than(r, d):
+        r = mag_sub(r, d)
+        q = mag_add(q, array('I', [1]))
+    return q, r
+
+
+def mag_divmod_reciprocal(a: array, d: array,
+                          mu: array) -> Tuple[array, array]:
+    # long division in k-limb digits, each digit costing two multiplications
+    k = len(d)
+    if len(a) <= 2 * k:
+        return _divmod_barrett(a, d, mu)
+    start = (len(a) - 1) // k * k
+    r = array('I', a[start:])
+    q = array('I')
+    for start in range(start - k, -1, -k):
+        digit, r = _divmod_barrett(_join(r, a[start:start + k], k), d, mu)
+        q = _join(q, digit, k)
+    return q, r
+
+
+def window_size(bits: int) -> int:
+    for k, limit in ((6, 671), (5, 239), (4, 79), (3, 23)):
+        if bits > limit:
+            return k
+    return 1
+
+
+def _windows(bits: str, k: int) -> dict:
+    # left-to-right sliding windows of at most k bits, as
+    # {position of the lowest bit: odd digit}
+    r = {}
+    n = len(bits)
+    i = 0
+    while i < n:
+        if bits[i] == '0':
+            i += 1
+            continue
+        j = min(i + k, n)
+        while bits[j - 1] == '0':
+            j -= 1
+        r[n - j] = int(bits[i:j], 2)
+        i = j
+    return r
+
+
+def window_multi_pow(pairs, one, mul, sqr):
+    # Straus: each base gets its own table of odd powers a, a**3, a**5, ...
+    # and its own windows, and all of them share one chain of squarings
+    tables = []
+    top = 0
+    for a, e in pairs:
+        bits = mag_to_bin(e)
+        if bits == '0':
+            continue
+        k = window_size(len(bits))
+        table = [a]
+        if k > 1:
+            a2 = sqr(a)
+            for _ in range((1 << (k - 1)) - 1):
+                table.append(mul(table[-1], a2))
+        tables.append((table, _windows(bits, k)))
+        top = max(top, len(bits))
+    z = None
+    for i in range(top - 1, -1, -1):
+        if z is not None:
+            z = sqr(z)
+        for table, windows in tables:
+            d = windows.get(i)
+            if d:
+                z = table[d >> 1] if z is None else mul(z, table[d >> 1])
+    return one if z is None else z
+
+
+def window_pow(a, e: array, one, mul, sqr):
+    return window_multi_pow([(a, e)], one, mul, sqr)
+
+
+def mag_pow(a: array, e: array) -> array:
+    k = mag_trailing_zeros(a)
+    if a and mag_bit_length(a) == k + 1:
+        return mag_lshift(array('I', [1]), k * int(mag_to_bin(e), 2))
+    # a copy, so that a ** 1 never shares the caller's limbs
+    return window_pow(array('I', a), e, array('I', [1]), mag_mul, mag_sqr)
+
+
+def mag_redc(t: array, n: array, n0inv: int) -> array:
+    # Montgomery reduction: t * BASE**-len(n) mod n, for t < n * BASE**len(n)
+    k = len(n)
+    u = list(t)
+    u.extend([0] * (2 * k + 1 - len(u)))
+    for i in range(k):
+        m = (u[i] * n0inv) & MASK
+        if not m:
+            continue
+        c = 0
+        j = i
+        for x in n:
+            c += u[j] + m * x
+            u[j] = c & MASK
+            c >>= SHIFT
+            j += 1
+        while c:
+            c += u[j]
+            u[j] = c & MASK
+            c >>= SHIFT
+            j += 1
+    r = mag_normalize(array('I', u[k:]))
+    if not mag_less_than(r, n):
+        r = mag_sub(r, n)
+    return r
+
+
+def mag_bit_length(a: array) -> int:
+    return SHIFT * (len(a) - 1) + a[-1].bit_length() if a else 0
+
+
+def _top_bits(a, h: int) -> int:
+    k = h // SHIFT
+    t = 0
+    for x in reversed(a[k:]):
+        t = (t << SHIFT) | x
+    return t >> (h - k * SHIFT)
+
+
+def _small(x: int) -> array:
+    return mag_normalize(array('I', [x & MASK, x >> SHIFT]))
+
+
+# 2x2 matrices (m11, m12, m21, m22, det < 0) with non-negative limb entries,
+# such that (a, b) = M (a', b') for the reduced pair (a', b')
+_IDENTITY = (array('I', [1]), array('I'), array('I'), array('I', [1]), False)
+
+
+def _mat_mul(m, n):
+    a, b, c, d, s = m
+    e, f, g, h, t = n
+    return (mag_add(mag_mul(a, e), mag_mul(b, g)),
+            mag_add(mag_mul(a, f), mag_mul(b, h)),
+            mag_add(mag_mul(c, e), mag_mul(d, g)),
+            mag_add(mag_mul(c, f), mag_mul(d, h)), s != t)
+
+
+def _mat_reduce(m, a, b):
+    # (a', b') = M**-1 (a, b), or None if M is not a valid reduction of (a, b)
+    m11, m12, m21, m22, neg = m
+    x, y = mag_mul(m22, a), mag_mul(m12, b)
+    z, w = mag_mul(m11, b), mag_mul(m21, a)
+    if neg:
+        x, y, z, w = y, x, w, z
+    if mag_less_than(x, y) or mag_less_than(z, w):
+        return None
+    a, b = mag_sub(x, y), mag_sub(z, w)
+    if mag_less_than(a, b):
+        return None
+    return a, b
+
+
+def _lehmer_matrix(a, b):
+    # Knuth, TAOCP vol. 2, 4.5.2, Algorithm L on the leading 62 bits
+    h = max(mag_bit_length(a) - 2 * SHIFT + 2, 0)
+    x, y = _top_bits(a, h), _top_bits(b, h)
+    A, B, C, D = 1, 0, 0, 1
+    neg = False
+    if not h:
+        while y:
+            q = x // y
+            A, C = C, A - q * C
+            B, D = D, B - q * D
+            x, y = y, x - q * y
+            neg = not neg
+    else:
+        while y + C and y + D:
+            q = (x + A) // (y + C)
+            if q != (x + B) // (y + D):
+                break
+            A, C = C, A - q * C
+            B, D = D, B - q * D
+            x, y = y, x - q * y
+            neg = not neg
+    if not B:
+        return None
+    return _small(abs(D)), _small(abs(B)), _small(abs(C)), _small(abs(A)), neg
+
+
+def _lehmer_step(a, b):
+    m = _lehmer_matrix(a, b)
+    if m is not None:
+        r = _mat_reduce(m, a, b)
+        if r is not None:
+            return m, r[0], r[1]
+    q, r = mag_divmod(a, b)
+    return (q, _IDENTITY[0], _IDENTITY[0], _IDENTITY[1], True), b, r
+
+
+def _hgcd_top(m, a, b, k: int):
+    # reduce (a, b) with the matrix of the leading limbs a[k:], b[k:]
+    if len(b) <= k:
+        return m, a, b
+    r = _hgcd(a[k:], b[k:])[0]
+    if r is _IDENTITY:
+        return m, a, b
+    ab = _mat_reduce(r, a, b)
+    # only a' > b' > 0 guarantees that the matrix follows Euclid's quotients
+    # on the full operands, so that the cofactors match extended Euclid
+    if ab is None or not ab[1] or not mag_less_than(ab[1], ab[0]):
+        return m, a, b
+    return _mat_mul(m, r), ab[0], ab[1]
+
+
+def _hgcd(a, b):
+    # half-gcd: Euclid steps until b has at most about half the limbs of a
+    n = len(a)
+    s = n // 2 + 2
+    m = _IDENTITY
+    if len(b) <= s:
+        return m, a, b
+    if n >= HGCD_CUTOFF:
+        m, a, b = _hgcd_top(m, a, b, n // 2)
+        k = len(a) - 2 * (len(a) - s) - 4
+        if k > 0:
+            m, a, b = _hgcd_top(m, a, b, k)
+    while len(b) > s:
+        r, a, b = _lehmer_step(a, b)
+        m = _mat_mul(m, r)
+    return m, a, b
+
+
+def mag_gcdext(a: array, b: array):
+    # d, u, v with u * a + v * b = d; u and v are (is_neg, limbs) pairs
+    swap = mag_less_than(a, b)
+    x, y = (b, a) if swap else (a, b)
+    m21, m22, neg = array('I'), array('I', [1]), False
+    while y:
+        r = _IDENTITY
+        if len(y) >= HGCD_CUTOFF:
+            r, x, y = _hgcd(x, y)
+        if r is _IDENTITY:
+            r, x, y = _lehmer_step(x, y)
+        m21, m22 = (mag_add(mag_mul(m21, r[0]), mag_mul(m22, r[2])),
+                    mag_add(mag_mul(m21, r[1]), mag_mul(m22, r[3])))
+        neg ^= r[4]
+    if swap:
+        a, b = b, a
+    u = neg, m22
+    v = False, array('I')
+    if b:
+        t = _s_sub((False, x), _s_mul(u, (False, a)))
+        v = t[0], mag_divmod(t[1], b)[0]
+    if swap:
+        u, v = v, u
+    # x is one of the inputs when the first division is exact
+    return array('I', x), u, v
+
+
+def _root_newton(a, k: int, x) -> array:
+    # descend from x >= floor(a ** (1 / k)) to floor(a ** (1 / k))
+    e = _small(k - 1)
     while True:
-        z = x
-        # x = ((s2_1 * x) + (s1 / (x ** s2_1))) / s2
-        x = l_divmod(l_add(l_mul(s2_1, x), l_divmod(s1, l_pow(x, s2_1))[0]), s2)[0]
-        if z == x or less_than(z, x):
-            return z
+        p = x if k == 2 else mag_pow(x, e)
+        t = mag_add(mag_mul_small(x, k - 1), mag_divmod(a, p)[0])
+        y = mag_rshift(t, 1) if k == 2 else mag_divmod_small(t, k)[0]
+        if not mag_less_than(y, x):
+            return x
+        x = y
+
+
+def mag_root(a: array, k: int) -> array:
+    if k == 1:
+        return array('I', a)
+    n = mag_bit_length(a)
+    if n <= k:
+        return array('I', [1] if a else [])
+    b = -(-n // k)
+    if b <= 48:
+        # the float estimate is off by a few units at most
+        h = max(n - 64, 0)
+        r = int(2 ** ((math.log2(_top_bits(a, h)) + h) / k))
+        e = _small(k)
+        while not mag_less_than(a, mag_pow(_small(r + 1), e)):
+            r += 1
+        while mag_less_than(a, mag_pow(_small(r), e)):
+            r -= 1
+        return _small(r)
+    # the root of the top half of the bits gives an overestimate that is
+    # correct to about half the bits, so Newton needs only a couple of steps
+    s = b // 2
+    r = mag_root(mag_rshift(a, k * s), k)
+    return _root_newton(a, k, mag_lshift(mag_add(r, array('I', [1])), s))
+
+
+def mag_isqrt(a: array) -> array:
+    return mag_root(a, 2)
+
+
+def _mod_small(a: array, d: int) -> int:
+    w = 0
+    for x in reversed(a):
+        w = ((w << SHIFT) | x) % d
+    return w
+
+
+def _is_small_prime(p: int) -> bool:
+    if p < 4:
+        return p > 1
+    if not p & 1:
+        return False
+    i = 3
+    while i * i <= p:
+        if not p % i:
+            return False
+        i += 2
+    return True
+
+
+def _residue_moduli(k: int) -> list:
+    # primes p = 1 mod k, packed into products below BASE; a non-power
+    # passes all of them with probability about k ** -len(primes) <= 2 ** -16
+    if k not in _RESIDUE_MODULI:
+        count = 1
+        while k ** count < 1 << 16:
+            count += 1
+        groups = []
+        p = 1
+        while count:
+            p += k
+            if not _is_small_prime(p):
+                continue
+            count -= 1
+            if groups and groups[-1][0] * p < BASE:
+                groups[-1] = groups[-1][0] * p, groups[-1][1] + (p,)
+            else:
+                groups.append((p, (p,)))
+        _RESIDUE_MODULI[k] = groups
+    return _RESIDUE_MODULI[k]
+
+
+def _is_power_residue(a: array, k: int) -> bool:
+    # a is a k-th power residue modulo every prime of _residue_moduli(k)
+    for m, primes in _residue_moduli(k):
+        w = _mod_small(a, m)
+        for p in primes:
+            x = w % p
+            if x and pow(x, (p - 1) // k, p) != 1:
+                return False
+    return True
+
+
+def mag_is_perfect_power(a: array, odd: bool = False) -> bool:
+    n = mag_bit_length(a)
+    if n < 2:
+        return True
+    t = mag_trailing_zeros(a)
+    sieve = bytearray([1]) * n
+    for k in range(2, n):
+        if not sieve[k]:
+            continue
+        sieve[k * k::k] = bytes(len(range(k * k, n, k)))
+        if odd and k == 2:
+            continue
+        # cheap necessary conditions first: k divides the power of two in a,
+        # and a is a k-th power modulo a few small primes
+        if t % k or not _is_power_residue(a, k):
+            continue
+        r = mag_root(a, k)
+        if pow(r[0], k, BASE) == a[0] and mag_pow(r, _small(k)) == a:
+            return True
+    return False
+
+
+def _from_dec_basic(s1: str) -> array:
+    r = []
+    n = len(s1) % DEC_SHIFT or DEC_SHIFT
+    for i in range(n - DEC_SHIFT, len(s1), DEC_SHIFT):
+        w = int(s1[max(i, 0):i + DEC_SHIFT])
+        for j, x in enumerate(r):
+            c = x * DEC_BASE + w
+            r[j] = c & MASK
+            w = c >> SHIFT
+        if w:
+            r.append(w)
+    return array('I', r)
+
+
+def _to_dec_basic(a: array) -> str:
+    parts = []
+    while a:
+        a, w = mag_divmod_small(a, DEC_BASE)
+        parts.append(w)
+    parts.reverse()
+    low = ''.join('%09d' % x for x in parts[1:])
+    return str(parts[0] if parts else 0) + low
+
+
+def _dec_power(k: int) -> array:
+    # 10 ** (DEC_SHIFT * 2 ** k)
+    while len(_DEC_POWERS) <= k:
+        _DEC_POWERS.append(mag_sqr(_DEC_POWERS[-1]))
+    return _DEC_POWERS[k]
+
+
+def from_dec(s1: str) -> array:
+    if len(s1) <= DEC_SHIFT * DEC_CONVERSION_CUTOFF:
+        return _from_dec_basic(s1)
+    k = ((len(s1) - 1) // DEC_SHIFT).bit_length() - 1
+    n = DEC_SHIFT << k
+    hi = from_dec(s1[:-n])
+    lo = from_dec(s1[-n:])
+    return mag_add(mag_mul(hi, _dec_power(k)), lo)
+
+
+def _to_dec(a: array, digits: int) -> str:
+    if len(a) <= DEC_CONVERSION_CUTOFF:
+        s = _to_dec_basic(a)
+        return s.zfill(digits) if digits else s
+    k = 0
+    while 2 * len(_dec_power(k + 1)) <= len(a) + 1:
+        k += 1
+    n = DEC_SHIFT << k
+    q, r = mag_divmod(a, _dec_power(k))
+    return _to_dec(q, digits and digits - n) + _to_dec(r, n)
+
+
+def to_dec(a: array) -> str:
+    return _to_dec(a, 0)
+
+
+_DEC_POWERS = [array('I', [DEC_BASE])]
+_RESIDUE_MODULI = {}
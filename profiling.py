@@ -0,0 +1,156 @@
+import json
+import sys
+from array import array
+from contextlib import contextmanager
+from functools import wraps
+from time import perf_counter
+
+import long_math
+from bigint import BigInt, MutableBigInt
+
+# long_math functions counted while a profile is active; nested calls are
+# counted too, so seconds are inclusive
+PRIMITIVES = (
+    'l_add', 'l_sub', 'l_mul', 'l_sqr', 'l_divmod', 'l_pow', 'l_root',
+    'from_dec', 'to_dec',
+    'mag_add', 'mag_sub', 'mag_iadd', 'mag_isub', 'mag_mul', 'mag_sqr',
+    'mag_mul_small', 'mag_divmod', 'mag_divmod_small',
+    'mag_divmod_reciprocal',
+    'mag_pow', 'mag_root', 'mag_gcdext', 'mag_redc',
+    'mag_lshift', 'mag_rshift',
+)
+
+# modules whose imported names are rebound to the counting wrappers
+MODULES = ('long_math', 'bigint', 'backend', 'bigint_array', 'limb_file',
+           'wire')
+
+_active = None
+
+
+class Stat:
+
+    def __init__(self):
+        self.calls = 0
+        self.limbs = 0
+        self.digits = 0
+        self.seconds = 0.0
+        # calls per power-of-two bucket of microseconds
+        self.histogram = {}
+
+    def record(self, args, seconds):
+        self.calls += 1
+        self.seconds += seconds
+        for a in args:
+            if isinstance(a, array):
+                self.limbs += len(a)
+            elif isinstance(a, str):
+                self.digits += len(a)
+        bucket = f'<{1 << int(seconds * 1e6).bit_length()}us'
+        self.histogram[bucket] = self.histogram.get(bucket, 0) + 1
+
+    def as_dict(self):
+        return {
+            'calls': self.calls,
+            'limbs': self.limbs,
+            'digits': self.digits,
+            'seconds': self.seconds,
+            'histogram': dict(self.histogram),
+        }
+
+
+class Profile:
+
+    def __init__(self):
+        self.stats = {}
+        self.allocations = {}
+
+    def as_dict(self):
+        return {
+            'primitives': {name: stat.as_dict()
+                           for name, stat in self.stats.items() if stat.calls},
+            'allocations': dict(self.allocations),
+        }
+
+    def to_json(self, **kwargs):
+        return json.dumps(self.as_dict(), **kwargs)
+
+    def _counted(self, name, fn):
+        stat = self.stats[name] = Stat()
+
+        @wraps(fn)
+        def wrapper(*args, **kwargs):
+            start = perf_counter()
+            try:
+                return fn(*args, **kwargs)
+            finally:
+                stat.record(args, perf_counter() - start)
+        return wrapper
+
+    def _allocated(self, cls, fn):
+        allocations = self.allocations
+
+        @wraps(fn)
+        def wrapper(self, *args, **kwargs):
+            if type(self) is cls:
+                name = cls.__name__
+                allocations[name] = allocations.get(name, 0) + 1
+            return fn(self, *args, **kwargs)
+        return wrapper
+
+    def _created(self, fn):
+        allocations = self.allocations
+
+        @wraps(fn)
+        def wrapper(cls, *args, **kwargs):
+            allocations[cls.__name__] = allocations.get(cls.__name__, 0) + 1
+            return fn(cls, *args, **kwargs)
+        return wrapper
+
+
+def _rebind(originals, patched):
+    # every module-level name and staticmethod bound to an original function
+    restore = []
+    for module_name in MODULES:
+        module = sys.modules.get(module_name)
+        if module is None:
+            continue
+        for key, value in list(vars(module).items()):
+            if id(value) in originals:
+                restore.append((module, key, value))
+                setattr(module, key, patched[id(value)])
+            elif isinstance(value, type):
+                for attr, member in list(vars(value).items()):
+                    if not isinstance(member, staticmethod):
+                        continue
+                    func_id = id(member.__func__)
+                    if func_id in originals:
+                        restore.append((value, attr, member))
+                        setattr(value, attr, staticmethod(patched[func_id]))
+    return restore
+
+
+@contextmanager
+def profile():
+    global _active
+    if _active is not None:
+        raise RuntimeError('a profile is already active')
+    p = _active = Profile()
+    functions = [getattr(long_math, name) for name in PRIMITIVES]
+    originals = {id(fn): fn for fn in functions}
+    patched = {key: p._counted(fn.__name__, fn)
+               for key, fn in originals.items()}
+    restore = _rebind(originals, patched)
+    new = BigInt.__dict__['_new'].__func__
+    restore += [(BigInt, '__init__', BigInt.__init__),
+                (MutableBigInt, '__init__', MutableBigInt.__init__),
+                (BigInt, '_new', BigInt.__dict__['_new'])]
+    BigInt.__init__ = p._allocated(BigInt, BigInt.__init__)
+    MutableBigInt.__init__ = p._allocated(MutableBigInt,
+                                          MutableBigInt.__init__)
+    BigInt._new = classmethod(p._created(new))
+    try:
+        yield p
+    finally:
+        for owner, key, value in reversed(restore):
+            setattr(owner, key, value)
+        _active = None
@@ -1,10 +1,41 @@
+import json
 import math
+import os
+import tempfile
 import unittest
 from random import randint
 
-from bigint import BigInt
-from long_math import (dec_to_bin, l_add, l_divmod, l_mul, l_pow, l_root,
-                       l_sub, less_than)
+import backend
+import benchmark
+import bigint_array
+import limb_file
+import long_math
+import profiling
+import tuning
+import wire
+from bigint import (BarrettContext, BigInt, CRTContext, Divisor,
+                    FixedBasePow, MontgomeryContext, MutableBigInt)
+from long_math import (dec_to_bin, from_dec, l_add, l_divmod, l_mul, l_pow,
+                       l_root, l_sqr, l_sub, less_than, to_dec)
+
+
+def int_root(x, k):
+    lo, hi = 0, 1 << (x.bit_length() // k + 1)
+    while lo < hi:
+        mid = (lo + hi + 1) // 2
+        lo, hi = (mid, hi) if mid ** k <= x else (lo, mid - 1)
+    return lo
+
+
+def euclid_gcd(a, b):
+    # extended Euclid: d, u, v with u * a + v * b == d
+    u0, u1, v0, v1 = 1, 0, 0, 1
+    while b:
+        q, r = divmod(a, b)
+        a, b = b, r
+        u0, u1 = u1, u0 - q * u1
+        v0, v1 = v1, v0 - q * v1
+    return a, u0, v0
 
 
 class TestLongMath(unittest.TestCase):
@@ -32,12 +63,31 @@ class TestLongMath(unittest.TestCase):
             y = randint(self.MIN, self.MAX)
             self.assertEqual(str(x * y), l_mul(str(x), str(y)))
 
+    def test_mul_large(self):
+        for digits in (100, 500, 1000, 2000):
+            x = randint(10 ** (digits - 1), 10 ** digits)
+            y = randint(10 ** (digits // 3), 10 ** digits)
+            self.assertEqual(str(x * y), l_mul(str(x), str(y)))
+            self.assertEqual(str(x * x), l_mul(str(x), str(x)))
+
+    def test_sqr(self):
+        for digits in (10, 100, 600, 1000, 2000):
+            x = randint(10 ** (digits - 1), 10 ** digits)
+            self.assertEqual(str(x * x), l_sqr(str(x)))
+
     def test_divmod(self):
         for _ in range(self.TESTS_COUNT):
             x = randint(self.MIN, self.MAX)
             y = randint(self.MIN, self.MAX)
             self.assertEqual(tuple(map(str, divmod(x, y))), l_divmod(str(x), str(y)))
 
+    def test_divmod_large(self):
+        for digits in (50, 400, 1000, 2000):
+            x = randint(10 ** (digits - 1), 10 ** digits)
+            y = randint(10 ** (digits // 3), 10 ** (digits // 2))
+            self.assertEqual(tuple(map(str, divmod(x, y))),
+                             l_divmod(str(x), str(y)))
+
     def test_pow(self):
         for _ in range(100):
             x = randint(0, 1000)
@@ -48,7 +98,13 @@ class TestLongMath(unittest.TestCase):
         for _ in range(100):
             x = randint(0, 100)
             y = randint(1, 100)
-            self.assertEqual(str(int(x ** (1 / y))), l_root(str(x), str(y)))
+            self.assertEqual(str(int_root(x, y)), l_root(str(x), str(y)))
+
+    def test_root_large(self):
+        for digits in (30, 300, 1000):
+            x = randint(10 ** (digits - 1), 10 ** digits)
+            for y in (2, 3, 7, 100, digits * 4):
+                self.assertEqual(str(int_root(x, y)), l_root(str(x), str(y)))
 
     def test_dec_to_bin(self):
         for _ in range(self.TESTS_COUNT):
@@ -61,6 +117,23 @@ class TestLongMath(unittest.TestCase):
             y = randint(self.MIN, self.MAX)
             self.assertEqual(x < y, less_than(str(x), str(y)))
 
+    def test_dec_conversion(self):
+        for _ in range(self.TESTS_COUNT):
+            x = randint(0, self.MAX)
+            limbs = from_dec(str(x))
+            self.assertEqual(x,
+                             sum(e << (32 * i) for i, e in enumerate(limbs)))
+            self.assertEqual(str(x), to_dec(limbs))
+
+    def test_dec_conversion_large(self):
+        for digits in (100, 400, 1000, 4000):
+            x = randint(10 ** (digits - 1), 10 ** digits)
+            limbs = from_dec(str(x))
+            self.assertEqual(x,
+                             sum(e << (32 * i) for i, e in enumerate(limbs)))
+            self.assertEqual(str(x), to_dec(limbs))
+            self.assertEqual(str(x), to_dec(from_dec('000' + str(x))))
+
 
 class TestBigInt(unittest.TestCase):
 
@@ -108,6 +181,38 @@ class TestBigInt(unittest.TestCase):
             big_y = BigInt(str(y))
             self.assertEqual(x % y, big_x % big_y)
 
+    def test_compare(self):
+        for _ in range(self.TESTS_COUNT):
+            x = randint(self.MIN, self.MAX)
+            y = randint(self.MIN, self.MAX)
+            big_x = BigInt(str(x))
+            big_y = BigInt(str(y))
+            self.assertEqual(x < y, big_x < big_y)
+            self.assertEqual(x <= y, big_x <= big_y)
+            self.assertEqual(x >= x, big_x >= big_x)
+            self.assertEqual(x > y, big_x > big_y)
+            self.assertEqual(x >= y, big_x >= big_y)
+            self.assertEqual(str(x), str(big_x))
+            self.assertEqual(hash(x), hash(big_x))
+        self.assertEqual(1, len({BigInt('12'), BigInt('012'), 12}))
+        self.assertRaises(TypeError, hash, MutableBigInt(12))
+
+    def test_divisor(self):
+        for bits in (20, 100, 3000):
+            y = randint(-2 ** bits, 2 ** bits) or 1
+            big_y = BigInt.from_int(y)
+            divisor = Divisor(big_y)
+            for cutoff in (long_math.RECIPROCAL_CUTOFF, 2):
+                with benchmark.cutoffs(RECIPROCAL_CUTOFF=cutoff):
+                    for _ in range(20):
+                        big_x = BigInt.from_int(
+                            randint(-2 ** (3 * bits), 2 ** (3 * bits)))
+                        self.assertEqual((big_x / big_y, big_x % big_y),
+                                         divisor.divmod(big_x))
+        self.assertEqual((-2, 2), Divisor(BigInt('3')).divmod(-7))
+        self.assertEqual((-2, -2), Divisor(BigInt('-3')).divmod(7))
+        self.assertRaises(ZeroDivisionError, Divisor, BigInt('0'))
+
     def test_pow(self):
         for _ in range(100):
             x = randint(-100, 100)
@@ -122,7 +227,33 @@ class TestBigInt(unittest.TestCase):
             y = randint(1, 100)
             big_x = BigInt(str(x))
             big_y = BigInt(str(y))
-            self.assertEqual(int(x ** (1 / y)), BigInt.root(big_x, big_y))
+            self.assertEqual(int_root(x, y), BigInt.root(big_x, big_y))
+        self.assertEqual(-3, BigInt.root(BigInt('-27'), BigInt('3')))
+        self.assertRaises(ValueError, BigInt.root, BigInt('-27'), BigInt('2'))
+
+    def test_isqrt(self):
+        for _ in range(self.TESTS_COUNT // 10):
+            x = randint(0, self.MAX ** 4)
+            self.assertEqual(math.isqrt(x), BigInt.isqrt(BigInt(str(x))))
+
+    def test_is_perfect_power(self):
+        for _ in range(100):
+            x = randint(3, 10 ** 6)
+            k = randint(2, 20)
+            self.assertTrue(BigInt(str(x ** k)).is_perfect_power())
+            self.assertFalse(BigInt(str(x ** k + 1)).is_perfect_power())
+        self.assertTrue(BigInt('-125').is_perfect_power())
+        self.assertFalse(BigInt('-4').is_perfect_power())
+
+    def test_is_perfect_power_large(self):
+        for k in (2, 3, 7, 101):
+            x = randint(10 ** 10, 10 ** 11) ** k << (k * randint(0, 40))
+            self.assertTrue(BigInt.from_int(x).is_perfect_power())
+            self.assertFalse(BigInt.from_int(x + 1).is_perfect_power())
+            self.assertFalse(BigInt.from_int(x * 3).is_perfect_power())
+        x = randint(10 ** 2999, 10 ** 3000)
+        self.assertEqual(any(int_root(x, k) ** k == x for k in (2, 3, 5)),
+                         BigInt.from_int(x).is_perfect_power())
 
     def test_gcd(self):
         for _ in range(10000):
@@ -135,6 +266,30 @@ class TestBigInt(unittest.TestCase):
             v = int(('-' if big_v.is_neg else '') + big_v.value)
             self.assertEqual(str(math.gcd(x, y)), d.value)
             self.assertEqual(str(u*x + v*y), d.value)
+        for x in (1, 7, 2 ** 32, 10 ** 20, 10 ** 200):
+            d, u, v = BigInt.gcd(BigInt(str(x)), BigInt(str(x)))
+            self.assertEqual((str(x), '1', '0'), (str(d), str(u), str(v)))
+
+    def test_gcd_large(self):
+        for digits in (100, 1000, 2000):
+            g = randint(1, 10 ** (digits // 4))
+            x = randint(0, 10 ** digits) * g
+            y = randint(0, 10 ** digits) * g
+            d, big_u, big_v = BigInt.gcd(BigInt(str(x)), BigInt(str(y)))
+            u = int(str(big_u))
+            v = int(str(big_v))
+            self.assertEqual(str(math.gcd(x, y)), str(d))
+            self.assertEqual(u*x + v*y, int(str(d)))
+
+    def test_gcd_large_factor(self):
+        # a common factor above HGCD_CUTOFF limbs runs the half-gcd to the
+        # end of the quotient sequence
+        for _ in range(20):
+            g = randint(1, 1 << (32 * long_math.HGCD_CUTOFF + 64))
+            x = randint(1, 1 << 300) * g
+            y = randint(1, 1 << 300) * g
+            d, u, v = BigInt.gcd(BigInt.from_int(x), BigInt.from_int(y))
+            self.assertEqual(euclid_gcd(x, y), (int(d), int(u), int(v)))
 
     def test_lsbgcd(self):
         for _ in range(1000):
@@ -148,6 +303,119 @@ class TestBigInt(unittest.TestCase):
             self.assertEqual(str(math.gcd(x, y)), d.value)
             self.assertEqual(str(u*x + v*y), d.value)
 
+    def test_bin_gcd(self):
+        for _ in range(1000):
+            x = randint(1, 10 ** 20)
+            y = randint(1, 10 ** 20)
+            d, big_u, big_v = BigInt.bin_gcd(BigInt(str(x)), BigInt(str(y)))
+            u = int(str(big_u))
+            v = int(str(big_v))
+            self.assertEqual(str(math.gcd(x, y)), d.value)
+            self.assertEqual(str(u*x + v*y), d.value)
+
+    def test_bitwise(self):
+        for _ in range(self.TESTS_COUNT // 10):
+            x = randint(self.MIN, self.MAX)
+            y = randint(self.MIN, self.MAX)
+            n = randint(0, 200)
+            big_x = BigInt(str(x))
+            big_y = BigInt(str(y))
+            self.assertEqual(x << n, big_x << n)
+            self.assertEqual(x >> n, big_x >> n)
+            self.assertEqual(x & y, big_x & big_y)
+            self.assertEqual(x | y, big_x | big_y)
+            self.assertEqual(x.bit_length(), big_x.bit_length())
+            self.assertEqual((x & -x).bit_length() - 1, big_x.trailing_zeros())
+
+    def test_int_interop(self):
+        for _ in range(self.TESTS_COUNT // 10):
+            x = randint(self.MIN, self.MAX)
+            y = randint(-300, 300) or 1
+            big_x = BigInt(str(x))
+            self.assertEqual(x, int(big_x))
+            self.assertEqual(BigInt.from_int(x), big_x)
+            self.assertEqual(x + y, big_x + y)
+            self.assertEqual(y + x, y + big_x)
+            self.assertEqual(x - y, big_x - y)
+            self.assertEqual(y - x, y - big_x)
+            self.assertEqual(x * y, big_x * y)
+            self.assertEqual(y * x, y * big_x)
+            self.assertEqual(x % y, big_x % y)
+            self.assertEqual(y % x, y % big_x)
+            self.assertEqual(x & y, y & big_x)
+            self.assertEqual(x | y, y | big_x)
+            self.assertEqual(x < y, big_x < y)
+            self.assertEqual(y < x, y < big_x)
+        self.assertIs(BigInt.from_int(7), BigInt.from_int(7))
+        self.assertEqual('-5', str(BigInt.from_int(-5)))
+
+    def test_bytes(self):
+        for _ in range(self.TESTS_COUNT // 10):
+            x = randint(self.MIN, self.MAX)
+            big_x = BigInt(str(x))
+            length = (x.bit_length() + 8) // 8
+            for byteorder in ('big', 'little'):
+                data = x.to_bytes(length, byteorder, signed=True)
+                self.assertEqual(
+                    data, big_x.to_bytes(length, byteorder, signed=True))
+                self.assertEqual(
+                    x, BigInt.from_bytes(data, byteorder, signed=True))
+                data = abs(x).to_bytes(length, byteorder)
+                self.assertEqual(abs(x), BigInt.from_bytes(data, byteorder))
+        self.assertRaises(OverflowError, BigInt('-1').to_bytes, 1)
+        self.assertRaises(OverflowError, BigInt('256').to_bytes, 1)
+
+    def test_limb_view(self):
+        x = BigInt('-123456789012345678901234567890')
+        view = x.limb_view()
+        self.assertEqual(list(x.limbs), view.tolist())
+        self.assertTrue(view.readonly)
+        self.assertEqual(x, BigInt.from_limbs(view, True))
+        self.assertEqual(x, BigInt.from_limbs(view.tobytes() + bytes(8), True))
+
+    def test_mutable(self):
+        for _ in range(self.TESTS_COUNT // 10):
+            x = randint(self.MIN, self.MAX)
+            y = randint(self.MIN, self.MAX)
+            n = randint(0, 100)
+            big_x = BigInt(str(x))
+            acc = MutableBigInt(big_x)
+            limbs = acc.limbs
+            acc += BigInt(str(y))
+            self.assertEqual(x + y, acc)
+            acc -= y
+            self.assertEqual(x, acc)
+            acc *= y
+            self.assertEqual(x * y, acc)
+            acc *= -7
+            self.assertEqual(x * y * -7, acc)
+            acc >>= n
+            self.assertEqual(x * y * -7 >> n, acc)
+            acc -= acc
+            self.assertEqual(0, acc)
+            self.assertEqual(x, big_x)
+            self.assertIsNot(limbs, big_x.limbs)
+
+    def test_mutable_results(self):
+        # results must not share limbs with a mutable operand
+        x = 123456789012345678901234567890
+        acc = MutableBigInt(BigInt(str(x)))
+        results = [
+            acc ** BigInt('1'),
+            BigInt.ring_pow(acc, BigInt('1'), BigInt(str(10 ** 40))),
+            BigInt.gcd(acc, acc)[0],
+            BigInt.gcd(BigInt('0'), acc),
+        ]
+        for r in results:
+            self.assertEqual(x, int(r))
+            self.assertEqual(str(x), str(r))
+        acc += 1
+        acc <<= 40
+        self.assertIsInstance(acc, MutableBigInt)
+        self.assertEqual((x + 1) << 40, acc)
+        for r in results:
+            self.assertEqual(x, int(r))
+
     def test_ring_add(self):
         values = [
             ('3', '4', '5', '2'),
@@ -186,8 +454,14 @@ class TestBigInt(unittest.TestCase):
 
     def test_ring_inv(self):
         values = [
-            ('873372847093', str(10 ** 12), '94559444997'),
+            ('873372847093', str(10 ** 12), '891730724957'),
+            ('2', '7', '4'),
             ('3', '6', None),
+            ('1', '7', '1'),
+            ('-1', '7', '6'),
+            ('-2', '7', '3'),
+            ('3', '-7', '-2'),
+            ('-3', '-7', '-5'),
         ]
         for *args, x in values:
             args = list(map(BigInt, args))
@@ -207,6 +481,366 @@ class TestBigInt(unittest.TestCase):
             args = list(map(BigInt, args))
             self.assertEqual(BigInt.ring_pow(*args[:3]), args[3])
 
+    def test_ring_pow_many(self):
+        n = randint(2, 10 ** 30)
+        xs = [randint(self.MIN, self.MAX) for _ in range(50)]
+        ms = [randint(0, 10 ** 20) for _ in range(50)]
+        expected = [str(pow(x, m, n)) if m else '1' for x, m in zip(xs, ms)]
+        big_xs = [BigInt(str(x)) for x in xs]
+        big_ms = [BigInt(str(m)) for m in ms]
+        big_n = BigInt(str(n))
+        for workers in (1, 2):
+            result = BigInt.ring_pow_many(big_xs, big_ms, big_n,
+                                          workers=workers)
+            self.assertEqual(expected, list(map(str, result)))
+
+    def test_montgomery(self):
+        for _ in range(100):
+            n = randint(10 ** 10, 10 ** 60) | 1
+            x = randint(self.MIN, self.MAX)
+            y = randint(0, self.MAX)
+            m = randint(0, 10 ** 40)
+            ctx = MontgomeryContext(BigInt(str(n)))
+            big_x = ctx.to_mont(BigInt(str(x)))
+            big_y = ctx.to_mont(BigInt(str(y)))
+            self.assertEqual(x % n, ctx.from_mont(big_x))
+            self.assertEqual(x * y % n, ctx.from_mont(ctx.mul(big_x, big_y)))
+            self.assertEqual(pow(x, m, n),
+                             ctx.pow(BigInt(str(x)), BigInt(str(m))))
+        self.assertRaises(ValueError, MontgomeryContext, BigInt('10'))
+
+    def test_barrett(self):
+        for _ in range(100):
+            n = randint(10 ** 10, 10 ** 60)
+            x = randint(self.MIN, self.MAX)
+            y = randint(self.MIN, self.MAX)
+            m = randint(0, 10 ** 40)
+            ctx = BarrettContext.cached(BigInt(str(n)))
+            big_x = ctx.reduce(BigInt(str(x)))
+            big_y = ctx.reduce(BigInt(str(y)))
+            self.assertEqual(x % n, big_x)
+            self.assertEqual(x * y % n, ctx.mul(big_x, big_y))
+            self.assertEqual(pow(x, m, n),
+                             ctx.pow(BigInt(str(x)), BigInt(str(m))))
+            big_x, big_y = BigInt(str(x)), BigInt(str(y))
+            big_m, big_n = BigInt(str(m)), BigInt(str(n))
+            self.assertEqual(x * y % n, BigInt.ring_mul(big_x, big_y, big_n))
+            with benchmark.cutoffs(BARRETT_CUTOFF=2):
+                self.assertEqual(x * y % n,
+                                 BigInt.ring_mul(big_x, big_y, big_n))
+                self.assertEqual((x + y) % n,
+                                 BigInt.ring_add(big_x, big_y, big_n))
+                self.assertEqual(pow(x, m, 2 * n),
+                                 BigInt.ring_pow(big_x, big_m, 2 * big_n))
+        self.assertIs(BarrettContext.cached(BigInt('12345678987654321')),
+                      BarrettContext.cached(BigInt('12345678987654321')))
+
+    def test_fixed_base_pow(self):
+        for _ in range(20):
+            g = randint(self.MIN, self.MAX)
+            n = randint(2, 10 ** 40)
+            fixed = FixedBasePow(BigInt(str(g)), BigInt(str(n)))
+            for _ in range(10):
+                m = randint(0, 10 ** randint(1, 80))
+                self.assertEqual(pow(g, m, n), fixed.pow(BigInt(str(m))))
+
+    def test_ring_multi_pow(self):
+        for _ in range(20):
+            n = randint(2, 10 ** randint(1, 60))
+            pairs = [(randint(self.MIN, self.MAX),
+                      randint(0, 10 ** randint(1, 40)))
+                     for _ in range(randint(1, 4))]
+            expected = math.prod(pow(x, m, n) for x, m in pairs) % n
+            big_pairs = [(BigInt(str(x)), BigInt(str(m))) for x, m in pairs]
+            self.assertEqual(expected,
+                             BigInt.ring_multi_pow(big_pairs, BigInt(str(n))))
+        self.assertEqual(1, BigInt.ring_multi_pow([(BigInt('5'), BigInt('0'))],
+                                                  BigInt('7')))
+
+    def test_ring_pow_crt(self):
+        primes = [2 ** 61 - 1, 2 ** 89 - 1, 2 ** 107 - 1, 2 ** 127 - 1]
+        for k in range(1, len(primes) + 1):
+            n = math.prod(primes[:k])
+            factors = [BigInt.from_int(p) for p in primes[:k]]
+            ctx = CRTContext(factors)
+            for _ in range(20):
+                x = randint(-n, n)
+                m = randint(0, n)
+                big_x, big_m = BigInt.from_int(x), BigInt.from_int(m)
+                self.assertEqual(pow(x, m, n),
+                                 BigInt.ring_pow(big_x, big_m, ctx.n, ctx))
+                self.assertEqual(pow(x, m, n),
+                                 BigInt.ring_pow(big_x, big_m, ctx.n, factors))
+            self.assertEqual(pow(3 * primes[0], 5, n),
+                             BigInt.ring_pow(factors[0] * 3, BigInt('5'),
+                                             ctx.n, ctx))
+        # coprime composite factors are used without reducing the exponent
+        self.assertEqual(9, BigInt.ring_pow(BigInt('3'), BigInt('10'),
+                                            BigInt('36'),
+                                            [BigInt('4'), BigInt('9')]))
+        x, m, n = BigInt('3'), BigInt('-5'), BigInt('35')
+        self.assertEqual(BigInt.ring_pow(x, m, n),
+                         BigInt.ring_pow(x, m, n, [BigInt('5'), BigInt('7')]))
+        ctx = CRTContext([BigInt(str(p)) for p in (561, 2047, 2 ** 89 - 1)])
+        self.assertEqual([False, False, True], ctx.primes)
+        self.assertRaises(ValueError, CRTContext, [BigInt('7'), BigInt('7')])
+        self.assertRaises(ValueError, BigInt.ring_pow, BigInt('2'),
+                          BigInt('3'), BigInt('35'),
+                          [BigInt('5'), BigInt('11')])
+
+
+class TestBackend(unittest.TestCase):
+
+    MIN = -10 ** 60
+    MAX = 10 ** 60
+    TESTS_COUNT = 100
+
+    def check(self):
+        for _ in range(self.TESTS_COUNT):
+            x = randint(self.MIN, self.MAX)
+            y = randint(self.MIN, self.MAX) or 1
+            n = randint(2, self.MAX)
+            big_x, big_y = BigInt(str(x)), BigInt(str(y))
+            self.assertEqual(x + y, big_x + big_y)
+            self.assertEqual(x - y, big_x - big_y)
+            self.assertEqual(x * y, big_x * big_y)
+            self.assertEqual(int(x / y), big_x / big_y)
+            self.assertEqual(x % y, big_x % big_y)
+            self.assertEqual(int_root(abs(x), 3),
+                             BigInt.root(abs(big_x), BigInt('3')))
+            big_n = BigInt(str(n))
+            self.assertEqual(pow(x, abs(y), n),
+                             BigInt.ring_pow(big_x, abs(big_y), big_n))
+            self.assertEqual(x * y % n, BigInt.ring_mul(big_x, big_y, big_n))
+            self.assertEqual((x + y) % n, BigInt.ring_add(big_x, big_y, big_n))
+            self.assertEqual((x - y) % n, BigInt.ring_sub(big_x, big_y, big_n))
+            self.assertEqual(pow(x, abs(y), n) * pow(y, abs(x), n) % n,
+                             BigInt.ring_multi_pow([(big_x, abs(big_y)),
+                                                    (big_y, abs(big_x))],
+                                                   big_n))
+            self.assertEqual(pow(x, abs(y), n),
+                             FixedBasePow(big_x, big_n).pow(abs(big_y)))
+            d, u, v = BigInt.gcd(abs(big_x), abs(big_y))
+            self.assertEqual(math.gcd(x, y), d)
+            self.assertEqual(d, u * abs(big_x) + v * abs(big_y))
+        self.assertEqual(3 ** 50, BigInt('3') ** BigInt('50'))
+        p, q = BigInt('1000003'), BigInt('998244353')
+        self.assertEqual(pow(12345, 678, 1000003 * 998244353),
+                         BigInt.ring_pow(BigInt('12345'),
+                                         BigInt('678'), p * q, [p, q]))
+
+    def test_limb(self):
+        with backend.using_backend('limb'):
+            self.check()
+
+    def test_int(self):
+        with backend.using_backend('int'):
+            self.check()
+
+    @unittest.skipIf(backend.gmpy2 is None, 'gmpy2 is not installed')
+    def test_gmpy2(self):
+        with backend.using_backend('gmpy2'):
+            self.check()
+
+    def test_select(self):
+        previous = backend.get_backend()
+        with backend.using_backend('int') as engine:
+            self.assertIs(engine, backend.get_backend())
+            self.assertEqual('int', engine.name)
+        self.assertIs(previous, backend.get_backend())
+        self.assertRaises(ValueError, backend.set_backend, 'abacus')
+
+
+class TestLimbFile(unittest.TestCase):
+
+    MAX = 2 ** 3000
+    TESTS_COUNT = 100
+
+    def setUp(self):
+        self.dir = tempfile.TemporaryDirectory()
+        self.addCleanup(self.dir.cleanup)
+        self.addCleanup(setattr,
+                        limb_file, 'CHUNK_LIMBS', limb_file.CHUNK_LIMBS)
+        limb_file.CHUNK_LIMBS = 5
+
+    def path(self, name, x=None):
+        path = os.path.join(self.dir.name, name)
+        if x is not None:
+            limb_file.LimbFile.write(path, BigInt.from_int(x))
+        return path
+
+    def read(self, path):
+        with limb_file.LimbFile(path) as f:
+            return int(f.to_bigint())
+
+    def test_arithmetic(self):
+        for _ in range(self.TESTS_COUNT):
+            x = randint(0, self.MAX)
+            y = randint(0, self.MAX >> randint(0, 3000))
+            a, b, out = self.path('a', x), self.path('b', y), self.path('out')
+            self.assertEqual((x > y) - (x < y), limb_file.file_cmp(a, b))
+            limb_file.file_add(a, b, out)
+            self.assertEqual(x + y, self.read(out))
+            limb_file.file_sub(*((a, b) if x >= y else (b, a)), out)
+            self.assertEqual(abs(x - y), self.read(out))
+            self.assertEqual(4 * -(-abs(x - y).bit_length() // 32),
+                             os.path.getsize(out))
+            m = randint(0, 2 ** 32 - 1)
+            limb_file.file_mul_small(a, m, out)
+            self.assertEqual(x * m, self.read(out))
+        self.assertRaises(ValueError, limb_file.file_sub,
+                          self.path('a', 1), self.path('b', 2), out)
+
+
+class TestBenchmark(unittest.TestCase):
+
+    def test_fit_exponent(self):
+        points = [(n, 1e-6 * n ** 1.5) for n in benchmark.sizes(10 ** 6)]
+        self.assertAlmostEqual(1.5, benchmark.fit_exponent(points))
+        self.assertIsNone(benchmark.fit_exponent([(10, 1.0)]))
+
+    def test_crossover(self):
+        first = [(10, 1), (20, 2), (50, 5), (100, 10)]
+        second = [(10, 2), (20, 1), (50, 6), (100, 5)]
+        self.assertEqual(100, benchmark.crossover(first, second))
+        self.assertIsNone(benchmark.crossover(second, second))
+
+    def test_run(self):
+        results = benchmark.run(['l_add', 'gcd', 'bin_gcd'], ['divmod'],
+                                max_digits=100, repeat=1)
+        self.assertEqual([10, 20, 50, 100],
+                         results['operations']['l_add']['digits'])
+        self.assertIn('knuth->burnikel_ziegler',
+                      results['variants']['divmod']['crossovers'])
+        self.assertEqual(set(benchmark.sizes(100)),
+                         set(results['variants']['gcd']['fastest']))
+        self.assertEqual([], benchmark.regressions(results, results))
+        slower = json.loads(json.dumps(results))
+        slower['operations']['l_add']['seconds'][0] *= 2
+        self.assertEqual('l_add', benchmark.regressions(results, slower)[0][0])
+
+
+class TestProfiling(unittest.TestCase):
+
+    def test_profile(self):
+        x = BigInt('123456789012345678901234567890123')
+        n = BigInt('987654321098765432109876543210987')
+        mag_mul = long_math.mag_mul
+        with profiling.profile() as p:
+            BigInt.ring_inv(x, n)
+            x * n
+            long_math.l_sub('1000', '1')
+            self.assertRaises(RuntimeError, profiling.profile().__enter__)
+        self.assertIs(mag_mul, long_math.mag_mul)
+        stats = json.loads(p.to_json())
+        self.assertEqual(1, stats['primitives']['mag_gcdext']['calls'])
+        self.assertEqual(1, stats['primitives']['l_sub']['calls'])
+        self.assertEqual(5, stats['primitives']['l_sub']['digits'])
+        self.assertGreaterEqual(stats['primitives']['mag_mul']['calls'], 1)
+        mag_mul = stats['primitives']['mag_mul']
+        self.assertEqual(mag_mul['calls'], sum(mag_mul['histogram'].values()))
+        self.assertGreater(stats['allocations']['BigInt'], 0)
+
+
+class TestTuning(unittest.TestCase):
+
+    def test_load_thresholds(self):
+        saved = {name: getattr(long_math, name)
+                 for name in long_math.TUNABLE_CUTOFFS}
+        with tempfile.TemporaryDirectory() as d:
+            path = os.path.join(d, 'thresholds.json')
+            self.assertEqual({}, long_math.load_thresholds(path))
+            with open(path, 'w') as f:
+                f.write('not json')
+            self.assertEqual({}, long_math.load_thresholds(path))
+            tuning.save_thresholds(
+                {'KARATSUBA_CUTOFF': 33, 'HGCD_CUTOFF': 1, 'MASK': 7}, path)
+            try:
+                self.assertEqual({'KARATSUBA_CUTOFF': 33},
+                                 long_math.load_thresholds(path))
+                self.assertEqual(33, long_math.KARATSUBA_CUTOFF)
+                self.assertEqual(saved['HGCD_CUTOFF'], long_math.HGCD_CUTOFF)
+            finally:
+                for name, value in saved.items():
+                    setattr(long_math, name, value)
+
+    def test_tune_one(self):
+        default = long_math.KARATSUBA_CUTOFF
+        best, timings = tuning.tune_one('KARATSUBA_CUTOFF', candidates=(8, 16),
+                                        limbs=(24,), repeat=1)
+        self.assertIn(best, (8, 16))
+        self.assertEqual({8, 16}, set(timings))
+        self.assertEqual(default, long_math.KARATSUBA_CUTOFF)
+
+
+class TestWire(unittest.TestCase):
+
+    def test_round_trip(self):
+        for count in (0, 1, 10, 100):
+            values = [randint(-10 ** randint(0, 300), 10 ** randint(0, 300))
+                      for _ in range(count)]
+            data = wire.dumps(BigInt.from_int(x) for x in values)
+            self.assertEqual(values, [int(x) for x in wire.loads(data)])
+            self.assertEqual(values,
+                             [int(x) for x in wire.loads(memoryview(data))])
+
+    def test_errors(self):
+        data = wire.dumps([BigInt('123456789012345678901234567890')])
+        self.assertRaises(ValueError, wire.loads, data[:-1])
+        self.assertRaises(ValueError, wire.loads, data[:3])
+        self.assertRaises(ValueError, wire.loads, b'NOPE' + data[4:])
+        self.assertRaises(ValueError, wire.loads,
+                          data[:4] + bytes([wire.VERSION + 1]) + data[5:])
+
+
+@unittest.skipIf(bigint_array.np is None, 'numpy is not installed')
+class TestBigIntArray(unittest.TestCase):
+
+    MAX = 10 ** 60
+    TESTS_COUNT = 1000
+
+    def setUp(self):
+        self.xs = [randint(0, self.MAX) for _ in range(self.TESTS_COUNT)]
+        self.ys = [randint(0, self.MAX) for _ in range(self.TESTS_COUNT)]
+        self.n = randint(2, 10 ** 40)
+        self.big_xs = bigint_array.BigIntArray(map(str, self.xs))
+        self.big_ys = bigint_array.BigIntArray(map(str, self.ys))
+
+    def assertArrayEqual(self, expected, big):
+        self.assertEqual(list(map(str, expected)), list(map(str, big)))
+
+    def test_arithmetic(self):
+        pairs = list(zip(self.xs, self.ys))
+        self.assertArrayEqual([x + y for x, y in pairs],
+                              self.big_xs + self.big_ys)
+        self.assertArrayEqual([x * y for x, y in pairs],
+                              self.big_xs * self.big_ys)
+        self.assertArrayEqual([x % self.n for x in self.xs],
+                              self.big_xs % BigInt(str(self.n)))
+        total = self.big_xs + self.big_ys
+        self.assertArrayEqual(self.xs, total - self.big_ys)
+        self.assertRaises(ValueError, self.big_xs.__sub__, total)
+
+    def test_indexing(self):
+        self.assertEqual(str(self.xs[-1]), str(self.big_xs[-1]))
+        self.assertArrayEqual(self.xs[1:5], self.big_xs[1:5])
+        self.assertArrayEqual(self.xs[::-3], self.big_xs[::-3])
+        self.assertArrayEqual([], self.big_xs[5:1])
+        self.assertRaises(TypeError, self.big_xs.__getitem__, (0, 1))
+
+    def test_ring(self):
+        pairs = list(zip(self.xs, self.ys))
+        n = BigInt(str(self.n))
+        m = randint(0, 10 ** 10)
+        self.assertArrayEqual([(x + y) % self.n for x, y in pairs],
+                              self.big_xs.ring_add(self.big_ys, n))
+        self.assertArrayEqual([(x - y) % self.n for x, y in pairs],
+                              self.big_xs.ring_sub(self.big_ys, n))
+        self.assertArrayEqual([(x * y) % self.n for x, y in pairs],
+                              self.big_xs.ring_mul(self.big_ys, n))
+        self.assertArrayEqual([pow(x, m, self.n) for x in self.xs],
+                              self.big_xs.ring_pow(BigInt(str(m)), n))
+
 
 if __name__ == '__main__':
     unittest.main()
@@ -0,0 +1,148 @@
+import argparse
+import json
+import os
+import platform
+import random
+import sys
+
+import long_math
+from benchmark import cutoffs, digits, measure
+from bigint import BigInt, Divisor
+from long_math import (from_dec, mag_divmod, mag_gcdext, mag_mul,
+                       mag_reciprocal, mag_sqr, to_dec)
+
+VERSION = 1
+
+_INF = sys.maxsize
+
+
+def _limbs(n, rng):
+    # about n limbs
+    return from_dec(digits(max(1, int(n * 32 * 0.30103)), rng))
+
+
+def _dec_round_trip(a):
+    return from_dec(to_dec(a))
+
+
+def _divisor_args(n, rng):
+    # the reciprocal is computed once per Divisor, so keep it out of the
+    # timings
+    d = Divisor(BigInt._new(_limbs(n, rng)))
+    d.mu = mag_reciprocal(d.d.limbs)
+    return d, BigInt._new(_limbs(2 * n, rng))
+
+
+def _ring_args(n, rng):
+    m = BigInt._new(_limbs(n, rng))
+    x = BigInt._new(_limbs(n, rng)) % m
+    return x, BigInt._new(_limbs(n, rng)) % m, m
+
+
+# name: (function, argument builder for an n-limb size, candidate values,
+# limb sizes timed for each candidate, cutoffs held fixed while tuning);
+# ordered so that every cutoff is tuned after the ones it builds on
+THRESHOLDS = {
+    'KARATSUBA_CUTOFF': (
+        mag_mul, lambda n, rng: (_limbs(n, rng), _limbs(n, rng)),
+        (16, 24, 32, 48, 64, 96, 128), (100, 160), {'TOOM3_CUTOFF': _INF}),
+    'TOOM3_CUTOFF': (
+        mag_mul, lambda n, rng: (_limbs(n, rng), _limbs(n, rng)),
+        (96, 128, 160, 224, 320, 448), (400, 640), {}),
+    'KARATSUBA_SQR_CUTOFF': (
+        mag_sqr, lambda n, rng: (_limbs(n, rng),),
+        (16, 24, 32, 48, 64, 96, 128), (100, 160), {'TOOM3_SQR_CUTOFF': _INF}),
+    'TOOM3_SQR_CUTOFF': (
+        mag_sqr, lambda n, rng: (_limbs(n, rng),),
+        (96, 128, 160, 224, 320, 448), (400, 640), {}),
+    'BURNIKEL_ZIEGLER_CUTOFF': (
+        mag_divmod, lambda n, rng: (_limbs(2 * n, rng), _limbs(n, rng)),
+        (32, 48, 64, 80, 112, 160), (200, 320), {}),
+    'DEC_CONVERSION_CUTOFF': (
+        _dec_round_trip, lambda n, rng: (_limbs(n, rng),),
+        (16, 24, 32, 40, 64, 96), (150, 300), {}),
+    'HGCD_CUTOFF': (
+        mag_gcdext, lambda n, rng: (_limbs(n, rng), _limbs(n, rng)),
+        (50, 75, 100, 150, 200), (300,), {}),
+    'RECIPROCAL_CUTOFF': (
+        Divisor.divmod, _divisor_args, (800, 1200, 1600, _INF), (1000, 1600),
+        {}),
+    'BARRETT_CUTOFF': (
+        BigInt.ring_mul, _ring_args, (256, 1024, _INF), (384, 1280), {}),
+}
+
+
+def tune_one(name, candidates=None, limbs=None, repeat=3, seed=0):
+    # the candidate with the smallest total time over the given operand sizes
+    fn, build, default_candidates, default_limbs, fixed = THRESHOLDS[name]
+    candidates = default_candidates if candidates is None else candidates
+    limbs = default_limbs if limbs is None else limbs
+    rng = random.Random(seed)
+    operands = [build(n, rng) for n in limbs]
+    timings = {}
+    for value in candidates:
+        with cutoffs(**fixed, **{name: value}):
+            timings[value] = sum(measure(fn, args, repeat)
+                                 for args in operands)
+    return min(timings, key=timings.get), timings
+
+
+def tune(names=None, repeat=3, seed=0, report=None):
+    # tuned cutoffs are applied to long_math as they are found, so later
+    # cutoffs are measured on top of the earlier ones
+    names = list(THRESHOLDS) if names is None else names
+    found = {}
+    for name in THRESHOLDS:
+        if name not in names:
+            continue
+        old = getattr(long_math, name)
+        found[name], _ = tune_one(name, repeat=repeat, seed=seed)
+        setattr(long_math, name, found[name])
+        if report:
+            report(name, old, found[name])
+    return found
+
+
+def save_thresholds(values, path=None):
+    path = path or long_math.thresholds_path()
+    directory = os.path.dirname(path)
+    if directory:
+        os.makedirs(directory, exist_ok=True)
+    data = {
+        'version': VERSION,
+        'python': platform.python_version(),
+        'machine': platform.machine(),
+        'thresholds': values,
+    }
+    with open(path, 'w') as f:
+        json.dump(data, f, indent=2)
+    return path
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(
+        prog='python -m bigint tune',
+        description='Measure the algorithm cutoffs for this machine.')
+    parser.add_argument('--only', nargs='*', choices=list(THRESHOLDS))
+    parser.add_argument('--repeat', type=int, default=3)
+    parser.add_argument('--seed', type=int, default=0)
+    parser.add_argument('-o', '--output',
+                        help=f'default: {long_math.thresholds_path()}')
+    parser.add_argument('--dry-run', action='store_true',
+                        help='print the cutoffs without saving them')
+    args = parser.parse_args(argv)
+
+    def report(name, old, new):
+        print(f'{name:<24} {old:>5} -> {new}', flush=True)
+
+    found = tune(args.only, args.repeat, args.seed, report)
+    if not args.dry_run:
+        # keep previously tuned cutoffs that were not measured this time
+        values = long_math.load_thresholds(args.output)
+        values.update(found)
+        print(f'saved to {save_thresholds(values, args.output)}')
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
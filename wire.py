@@ -0,0 +1,46 @@
+import struct
+
+from bigint import BigInt
+from long_math import mag_from_bytes, mag_normalize, mag_to_bytes
+
+MAGIC = b'BIGI'
+VERSION = 1
+
+# magic, version, count; then per value: sign, limb count, little-endian limbs
+_HEADER = struct.Struct('<4sBI')
+_ITEM = struct.Struct('<BI')
+
+
+def dumps(values):
+    values = list(values)
+    parts = [_HEADER.pack(MAGIC, VERSION, len(values))]
+    for x in values:
+        parts.append(_ITEM.pack(x.is_neg, len(x.limbs)))
+        parts.append(mag_to_bytes(x.limbs))
+    return b''.join(parts)
+
+
+def loads(data):
+    data = memoryview(data).cast('B')
+    try:
+        magic, version, count = _HEADER.unpack_from(data)
+    except struct.error:
+        raise ValueError('truncated BigInt array header') from None
+    if magic != MAGIC:
+        raise ValueError('not a BigInt array')
+    if version != VERSION:
+        raise ValueError(f'unsupported BigInt array version: {version}')
+    offset = _HEADER.size
+    values = []
+    for _ in range(count):
+        try:
+            is_neg, n = _ITEM.unpack_from(data, offset)
+        except struct.error:
+            raise ValueError('truncated BigInt array') from None
+        offset += _ITEM.size
+        if offset + 4 * n > len(data):
+            raise ValueError('truncated BigInt array')
+        limbs = mag_from_bytes(data[offset:offset + 4 * n])
+        values.append(BigInt._new(mag_normalize(limbs), bool(is_neg)))
+        offset += 4 * n
+    return values